@@ -1,121 +1,246 @@
 """
-This file contains a small program used to populate the database with new Routes, Journeys,
-Reservations, and Tickets automatically.
+This file contains a small program used to populate the database with a load-test dataset:
+Stations, Routes, Journeys, Clients with their Passengers, Reservations and Tickets.
+
+Every count is a parameter and the data only depends on the seed (and on what the database already contains).
+The rows are written directly with bulk_create, batch by batch: the reservations and tickets are never
+accumulated in memory, which only grows with the size of the timetable and the number of clients,
+so that tens of millions of tickets can be generated.
+
+Example:
+    python generate_data.py --stations 100 --routes 400 --days 60 --clients 20000 --reservations 2000000 --seed 1
 """
 
+import argparse
 import os
-import django
-import json
-from datetime import datetime, timedelta
 import random
+import string
+import time
+from array import array
+from datetime import date, datetime, timedelta
+
+import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "reservations.settings")
 django.setup()
 
-from reservationsapp.models import Station, Client, Journey, Passager, generate_if_number
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from reservationsapp import analytics, rollups, timetable
+from reservationsapp.distances import great_circle, invalidate_distances
+from reservationsapp.models import Station, Route, Journey, Client, Passager, Reservation, Ticket, count_tickets
+from reservationsapp.seats import CAPACITY, seat_number
+
+# Characters of the reservation and ticket numbers
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_SPACE = len(CODE_ALPHABET) ** 6
+# Numbers checked against the database by query, below the limits on the number of query parameters
+CODES_PER_QUERY = 900
+
+
+class CodeSequence():
+    """
+    Unique 6 characters numbers in a random-looking order: the i-th number is (a * i + b) mod 36^6,
+    a being prime with 36, so that millions of numbers never collide, unlike random draws.
+    The numbers already used in the database, by earlier imports or bookings, are skipped: each batch is
+    checked with a single query, so that memory does not grow with the size of the table.
+    """
+    def __init__(self, generator, model):
+        self.factor = generator.randrange(1, CODE_SPACE // 6) * 6 + generator.choice((1, 5))
+        self.offset = generator.randrange(CODE_SPACE)
+        self.index = 0
+        self.model = model
+
+    def next(self):
+        value = (self.factor * self.index + self.offset) % CODE_SPACE
+        self.index += 1
+        code = ''
+        for _ in range(6):
+            value, digit = divmod(value, len(CODE_ALPHABET))
+            code += CODE_ALPHABET[digit]
+        return code
+
+    def take(self, count):
+        """ Returns count numbers not used in the database """
+        codes = []
+        while len(codes) < count:
+            candidates = [self.next() for _ in range(min(count - len(codes), CODES_PER_QUERY))]
+            used = set(self.model.objects.filter(if_number__in=candidates).values_list('if_number', flat=True))
+            codes.extend(code for code in candidates if code not in used)
+        return codes
+
+
+def generate_stations(generator, count):
+    """
+    Returns the stations of the network: the existing ones, completed with new stations spread over France.
+
+    Returns:
+        list: The (id, latitude, longitude) of count stations
+    """
+    existing = Station.objects.count()
+    Station.objects.bulk_create(
+        Station(city=f"Gare {index}", latitude=generator.uniform(43, 50), longitude=generator.uniform(-2, 7))
+        for index in range(existing + 1, count + 1)
+    )
+    return list(Station.objects.order_by('id').values_list('id', 'latitude', 'longitude')[:count])
+
 
-def generate_routes_and_journeys():
+def generate_routes_and_journeys(generator, stations, routes_count, start_date, days, journeys_per_day, batch_size):
     """
-    Generates random routes and journeys using existing stations in the database.
+    Generates random routes between the stations and their journeys, every day of the period.
+
+    Returns:
+        array: The ids of the journeys created
     """
+    pairs = set()
+    while len(pairs) < min(routes_count, len(stations) * (len(stations) - 1)):
+        departure, arrival = generator.sample(stations, 2)
+        pairs.add((departure, arrival))
+
     routes = []
-    journeys = []
-    stations = list(Station.objects.all())
-    route_id = 1  # Starting ID for routes
-    journey_id = 1  # Starting ID for journeys
-
-    for i in range(route_id, route_id + 20):  # Generate 30 routes
-        departure_station = random.choice(stations)
-        arrival_station = random.choice(stations)
-        while departure_station == arrival_station:
-            arrival_station = random.choice(stations)
-
-        routes.append({
-            "model": "reservationsapp.route",
-            "pk": i,
-            "fields": {
-                "departure_station": departure_station.id,
-                "arrival_station": arrival_station.id
-            }
-        })
-
-        # Generate multiple journeys for each route
-        start_date = datetime(2024, 5, 1)
-        end_date = datetime(2024, 5, 31)
-        current_date = start_date
-        while current_date <= end_date:
-            departure_time = datetime(current_date.year, current_date.month, current_date.day, 
-                                      random.randint(6, 20), random.randint(0, 59))
-            arrival_time = departure_time + timedelta(hours=random.randint(1, 3))
-            journeys.append({
-                "model": "reservationsapp.journey",
-                "pk": journey_id,
-                "fields": {
-                    "route": i,
-                    "departure_date_time": departure_time.strftime("%Y-%m-%dT%H:%M"),
-                    "arrival_date_time": arrival_time.strftime("%Y-%m-%dT%H:%M")
-                }
-            })
-            journey_id += 1
-            current_date += timedelta(days=1)
-
-    return routes, journeys
-
-def generate_reservations_and_tickets():
+    for departure, arrival in sorted(pairs):
+        distance = None
+        if None not in departure[1:] + arrival[1:]:
+            distance = great_circle(departure[1], departure[2], arrival[1], arrival[2])
+        routes.append(Route(departure_station_id=departure[0], arrival_station_id=arrival[0], distance=distance))
+    routes = Route.objects.bulk_create(routes, batch_size=batch_size)
+
+    journey_ids = array('q')
+    batch = []
+    for day in range(days):
+        start_of_day = timezone.make_aware(datetime.combine(start_date + timedelta(days=day), datetime.min.time()))
+        for route in routes:
+            for _ in range(journeys_per_day):
+                # Between 6:00 and 21:00, at 100 to 250 km/h plus at least 10 minutes
+                departure_time = start_of_day + timedelta(minutes=generator.randrange(6 * 60, 21 * 60))
+                duration = 10 + (route.distance or 200) / generator.uniform(100, 250) * 60
+                batch.append(Journey(route=route, departure_date_time=departure_time,
+                                     arrival_date_time=departure_time + timedelta(minutes=int(duration))))
+                if len(batch) >= batch_size:
+                    journey_ids.extend(journey.pk for journey in Journey.objects.bulk_create(batch))
+                    batch = []
+    journey_ids.extend(journey.pk for journey in Journey.objects.bulk_create(batch))
+    return journey_ids
+
+
+def generate_clients(generator, count, passengers_per_client, batch_size):
     """
-    Generates random reservations and tickets using existing clients and journeys.
+    Generates clients, each one with its passengers.
+
+    Returns:
+        list: The (client id, passenger ids) of the clients
     """
-    reservations = []
-    tickets = []
-    all_journeys = list(Journey.objects.all())
-    clients = list(Client.objects.all())
-    reservation_id = 140
-    ticket_id = 100
-
-    for i in range(reservation_id, reservation_id + 1000):  # Generate 200 reservations
-        client = random.choice(clients)
-        selected_journeys = random.sample(all_journeys, k=random.randint(1, 3))
-        reservation_date = datetime(2024, 2, 1) + timedelta(days=random.randint(0, 90))
-
-        reservations.append({
-            "model": "reservationsapp.reservation",
-            "pk": i,
-            "fields": {
-                "reservation_date": reservation_date.strftime("%Y-%m-%d"),
-                "if_number": generate_if_number(),
-                "client": client.id,
-                "journeys": [j.id for j in selected_journeys]
-            }
-        })
-
-        for journey in selected_journeys:
-            passengers = Passager.objects.filter(user=client.user)
-            for passenger in passengers:
-                tickets.append({
-                    "model": "reservationsapp.ticket",
-                    "pk": ticket_id,
-                    "fields": {
-                        "if_number": generate_if_number(),
-                        "passenger": passenger.id,
-                        "car": random.randint(1, 15),
-                        "seat": random.randint(1, 120),
-                        "journey": journey.id,
-                        "reservation": i
-                    }
-                })
-                ticket_id += 1
-
-    return reservations, tickets
-
-def write_to_json():
+    # Usernames starting after the existing users, so that the program can be run several times
+    prefix = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    clients = []
+    for start in range(0, count, batch_size):
+        users = User.objects.bulk_create(
+            User(username=f"load{prefix}-{index}", password='!', first_name=f"Client {index}")
+            for index in range(start, min(start + batch_size, count))
+        )
+        created = Client.objects.bulk_create(Client(user=user, address=f"{generator.randrange(1, 200)} rue de la Gare") for user in users)
+        passengers = Passager.objects.bulk_create(
+            Passager(user=user, first_name=f"Passager {number}", last_name=user.first_name)
+            for user in users
+            for number in range(1, passengers_per_client + 1)
+        )
+        for index, client in enumerate(created):
+            clients.append((client.pk, [passenger.pk for passenger in passengers[index * passengers_per_client:(index + 1) * passengers_per_client]]))
+    return clients
+
+
+def generate_reservations_and_tickets(generator, clients, journey_ids, count, booking_start, booking_days, max_journeys, batch_size):
     """
-    Writes generated data into a JSON file.
+    Generates random reservations of the clients on the journeys, with a ticket per passenger of the client
+    on every journey booked. The seats are given in order on each journey, full journeys being skipped.
+
+    Returns:
+        int: The number of tickets created
     """
-    routes, journeys = generate_routes_and_journeys()
-    reservations, tickets = generate_reservations_and_tickets()
-    data = routes + journeys + reservations + tickets
-    with open('generated_data.json', 'w') as f:
-        json.dump(data, f, indent=4)
+    reservation_codes = CodeSequence(generator, Reservation)
+    ticket_codes = CodeSequence(generator, Ticket)
+    # Number of seats taken on each journey, in the order of journey_ids
+    seats_taken = array('H', bytes(2 * len(journey_ids)))
+    tickets_count = 0
+
+    # The reservations are spread evenly over the booking period, one day after the other, as bulk_create
+    # gives them today's date (auto_now_add) and they are dated by a single update per batch
+    for day in range(booking_days):
+        reservation_date = booking_start + timedelta(days=day)
+        remaining = count // booking_days + (day < count % booking_days)
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            remaining -= size
+            with transaction.atomic():
+                picks = [(generator.choice(clients), generator.sample(range(len(journey_ids)), generator.randint(1, max_journeys)))
+                         for _ in range(size)]
+                reservations = Reservation.objects.bulk_create(
+                    Reservation(client_id=client[0], if_number=code) for (client, _), code in zip(picks, reservation_codes.take(size))
+                )
+                Reservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).update(reservation_date=reservation_date)
+
+                links, tickets = [], []
+                for reservation, (client, journeys) in zip(reservations, picks):
+                    for journey in journeys:
+                        if seats_taken[journey] + len(client[1]) > CAPACITY:
+                            continue
+                        links.append(Reservation.journeys.through(reservation_id=reservation.pk, journey_id=journey_ids[journey]))
+                        for passenger_id in client[1]:
+                            car, seat = seat_number(seats_taken[journey])
+                            seats_taken[journey] += 1
+                            tickets.append(Ticket(passenger_id=passenger_id, car=car, seat=seat,
+                                                  journey_id=journey_ids[journey], reservation_id=reservation.pk))
+                for ticket, code in zip(tickets, ticket_codes.take(len(tickets))):
+                    ticket.if_number = code
+                Reservation.journeys.through.objects.bulk_create(links)
+                Ticket.objects.bulk_create(tickets)
+                tickets_count += len(tickets)
+    return tickets_count
+
+
+def refresh_caches():
+    """
+    Renews what the signals keep up to date, as bulk_create does not send them.
+    """
+    Journey.objects.update(occupancy=count_tickets())
+    invalidate_distances()
+    timetable.invalidate_network()
+    analytics.invalidate_reports()
+    rollups.refresh(rebuild=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Populates the database with a deterministic load-test dataset")
+    parser.add_argument('--stations', type=int, default=20, help="Number of stations, created if missing")
+    parser.add_argument('--routes', type=int, default=20, help="Number of routes created")
+    parser.add_argument('--start-date', type=date.fromisoformat, default=date(2024, 5, 1), help="First day of the journeys")
+    parser.add_argument('--days', type=int, default=31, help="Number of days with journeys")
+    parser.add_argument('--journeys-per-day', type=int, default=1, help="Journeys of each route every day")
+    parser.add_argument('--clients', type=int, default=100, help="Number of clients created")
+    parser.add_argument('--passengers', type=int, default=2, help="Passengers of each client")
+    parser.add_argument('--reservations', type=int, default=1000, help="Number of reservations created")
+    parser.add_argument('--max-journeys', type=int, default=3, help="Maximum number of journeys of a reservation")
+    parser.add_argument('--booking-days', type=int, default=90, help="Reservations are made during the days before the start date")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator")
+    parser.add_argument('--batch-size', type=int, default=2000, help="Rows written per query")
+    options = parser.parse_args()
+
+    generator = random.Random(options.seed)
+    begin = time.perf_counter()
+    stations = generate_stations(generator, options.stations)
+    journey_ids = generate_routes_and_journeys(generator, stations, options.routes, options.start_date,
+                                               options.days, options.journeys_per_day, options.batch_size)
+    clients = generate_clients(generator, options.clients, options.passengers, options.batch_size)
+    tickets = generate_reservations_and_tickets(generator, clients, journey_ids, options.reservations,
+                                                options.start_date - timedelta(days=options.booking_days), options.booking_days,
+                                                min(options.max_journeys, len(journey_ids)), options.batch_size)
+    refresh_caches()
+    print(f"{len(stations)} stations, {len(journey_ids)} journeys, {len(clients)} clients, "
+          f"{options.reservations} reservations and {tickets} tickets in {time.perf_counter() - begin:.1f} s")
+
 
 if __name__ == '__main__':
-    write_to_json()
\ No newline at end of file
+    main()
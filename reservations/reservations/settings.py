@@ -37,6 +37,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "reservationsapp.querybudget.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "reservations.urls"
@@ -72,6 +73,20 @@ DATABASES = {
 }
 
 
+# Cache shared by the server workers and the management commands: the version stamps of the timetable,
+# the distances and the statistics are stored in it (see reservationsapp/versions.py), so an invalidation
+# made by one process reaches the others. Stamps evicted from it are renewed, never read as current.
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -114,6 +129,33 @@ STATIC_URL = "/static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# Number of hours after the requested departure during which the journey planner looks for connections
+# (the following days are only loaded when a search reaches them)
+ROUTER_HORIZON_HOURS = 24
+
+# Batch journey planner: maximum number of queries per request, and process pool started by wsgi.py
+# (when BATCH_ROUTING_WORKERS is more than 1), used when a batch needs at least BATCH_ROUTING_POOL_THRESHOLD
+# profile scans (one per origin and window of departure times)
+BATCH_ROUTING_MAX_QUERIES = 1000
+BATCH_ROUTING_WORKERS = 4
+BATCH_ROUTING_POOL_THRESHOLD = 64
+
+# Lifetime in seconds of the cached statistics reports reaching today or the future, and of the reports
+# of past periods (both are also dropped as soon as their data changes)
+ANALYTICS_CACHE_TIMEOUT = 60
+ANALYTICS_PAST_CACHE_TIMEOUT = 86400
+
+# Seconds during which the responses of the timetable endpoints are reused without revalidation
+# (they are then revalidated with their ETag, see reservationsapp/httpcache.py)
+TIMETABLE_CACHE_MAX_AGE = 30
+
+# Days of journeys whose partition is kept by the timetable of each process, the oldest built being dropped first
+TIMETABLE_MAX_DAYS = 62
+
+# Raise an error when a view runs more queries than its @query_budget, instead of logging a warning
+QUERY_BUDGET_RAISE = DEBUG
+
+
 LOGIN_REDIRECT_URL = '/reservations/journeys/'  
 LOGOUT_REDIRECT_URL = '/login/'  
 
@@ -5,3 +5,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "reservations.settings")
 
 application = get_wsgi_application()
+
+# The workers of the batch journey planner are forked once per server process, before it serves any request
+# (with a server that preloads the application, the workers it forks afterwards answer the batches themselves)
+from reservationsapp.batch import start_pool  # noqa: E402
+
+start_pool()
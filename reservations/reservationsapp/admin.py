@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
-from .models import Station, Journey, Route, Reservation, Client, Passager, Ticket
+from .models import Station, Journey, Route, Reservation, Client, Passager, Ticket, SeatInventory
 
 
 class JourneyAdmin(admin.ModelAdmin):
@@ -24,11 +24,24 @@ class TicketAdmin(admin.ModelAdmin):
 class ClientAdmin(admin.ModelAdmin):
     fields = ["user", "address"]
 
+class SeatInventoryAdmin(admin.ModelAdmin):
+    # Maintained by the bookings (see seats.py)
+    list_display = ["journey", "free_seats"]
+    list_select_related = ["journey__route__departure_station", "journey__route__arrival_station"]
+    readonly_fields = ["journey", "free_seats", "version"]
+    exclude = ["seats"]
+
+class RouteAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "distance"]
+    list_select_related = ["departure_station", "arrival_station"]
+    ordering = ["distance"]
+
    
 admin.site.register(Journey)
-admin.site.register(Route)
+admin.site.register(Route, RouteAdmin)
 admin.site.register(Station)
 admin.site.register(Reservation,ReservationAdmin)
 admin.site.register(Client, ClientAdmin)
 admin.site.register(Passager)
-admin.site.register(Ticket, TicketAdmin)
\ No newline at end of file
+admin.site.register(Ticket, TicketAdmin)
+admin.site.register(SeatInventory, SeatInventoryAdmin)
\ No newline at end of file
@@ -4,79 +4,125 @@
 """
 import sys
 import math
-from math import sin, cos, acos, radians
-from .models import Station, Journey, Route
-import networkx as nx
-import matplotlib.pyplot as plt
+from django.conf import settings
+from .models import Journey
+from .timetable import get_timetable, local_day, day_bounds
+from array import array
 from collections import defaultdict
 from datetime import datetime, timedelta
 import heapq
+from bisect import bisect_left, bisect_right
 
-class Graph():
+
+class TimetableSearch():
+    """
+        ->Base of the routing engines: gives access to the day partitions of the timetable snapshot
+        ->The search horizon can span several days (settings.ROUTER_HORIZON_HOURS) to find overnight connections
+            ->the partition of a later day is only loaded when the search reaches that day
+    """
+
+    def __init__(self, depart_date_time, timetable=None, horizon=None):
+        """
+            ->depart_date_time is an aware datetime
+            ->the journeys are read from the shared timetable snapshot, or from the given one
+            ->horizon is the number of hours after depart_date_time whose days can be used
+        """
+        self.depart_date_time = depart_date_time
+        #the timetable is shared by every search of the process, so the database is only read once per day
+        self.timetable = timetable or get_timetable()
+        self.stations = self.timetable.stations
+        self.departure_time = int(depart_date_time.timestamp()) # epoch seconds
+
+        if horizon is None:
+            horizon = getattr(settings, 'ROUTER_HORIZON_HOURS', 24)
+        self.first_day = local_day(depart_date_time)
+        last_day = local_day(depart_date_time + timedelta(hours=horizon))
+        # Start of each day of the horizon, in epoch seconds
+        self.day_starts = [
+            int(day_bounds(self.first_day + timedelta(days=offset))[0].timestamp())
+            for offset in range((last_day - self.first_day).days + 1)
+        ]
+        self._days = {}
+
+    def day(self, offset):
+        """
+        Returns the partition of the offset-th day of the horizon, loading it on first use.
+        """
+        if offset not in self._days:
+            self._days[offset] = self.timetable.day(self.first_day + timedelta(days=offset))
+        return self._days[offset]
+
+    def next_departure(self, lookup, time, bound=float("inf")):
+        """
+        Finds the departure arriving first among those that can be caught at the given time,
+        looking into the following days as long as they may give an earlier arrival.
+
+        Args:
+        - lookup: A function returning, for a day partition, the (departure times, arrival times, earliest arrivals, ...)
+          arrays to search, or None.
+        - time: The time from which the departure can be caught, in epoch seconds.
+        - bound: Arrival time that the departure has to beat, so that later days are not loaded for nothing.
+
+        Returns:
+        - A tuple (arrival time, day partition, index), or None if no departure beats the bound.
+        """
+        best = None
+        for offset in range(max(bisect_right(self.day_starts, time) - 1, 0), len(self.day_starts)):
+            # The journeys of a day arrive after its start
+            if self.day_starts[offset] >= (best[0] if best else bound):
+                break
+            day = self.day(offset)
+            arrays = lookup(day)
+            if arrays is None:
+                continue
+            departures, arrivals, earliest_arrivals = arrays[0], arrays[1], arrays[2]
+            index = bisect_left(departures, time)
+            if index < len(departures):
+                index = earliest_arrivals[index]
+                if arrivals[index] < (best[0] if best else bound):
+                    best = (arrivals[index], day, index)
+        return best
+
+
+class Graph(TimetableSearch):
     """
         ->Contains a graph, initialised with the data base
         ->Contains methods able to route the best path using the A* search algorithm
             ->Implementing the A* greatly reduces costs despite there being a chance of not returning the best possible path
             ->This implementation works on taking into account train waiting times 
+        ->The graph is the CSR adjacency of the timetable snapshot: stations are numbered from 0
+            ->the search state is kept in arrays indexed by station number, networkx is only used by to_networkx
 
 
     """
 
 
-    def __init__(self, start_point, end_point, depart_date_time):
+    def __init__(self, start_point, end_point, depart_date_time, timetable=None, horizon=None):
         """
             Initialise graph with stations, routes and weights or edges
             ->instead of passing through the routes, go by journeys given they're associated with routes
             ->start_point / end_point required for the algorithm
             ->start and end point correspond to a Station object
+            ->the journeys are read from the timetable snapshot, stations are then identified by their id
         """
+        super().__init__(depart_date_time, timetable, horizon)
 
-        self.depart_date_time = depart_date_time
-        self.stations = Station.objects.all()
-        end_of_day = depart_date_time.replace(hour=23, minute=59, second=59, microsecond=999999)
-        #filter the required journeys -> here only look till end of day
-        self.journeys = Journey.objects.filter( #routes can be accessed through journey so no need to query routes
-            departure_date_time__gte = depart_date_time,  #>=
-            departure_date_time__lte = end_of_day #<=
-        )
-
-        self.G = nx.DiGraph()
-        self.edges = defaultdict(dict) # avoids key errors #stored as dic of dics, key1 = depart, key2 = arrival, value = weight
-        
-        #populate the edge dictionary: contains list of tuples
-        for journey in self.journeys:
-            
-            #check if departure and arrival in dic, if not then create dic or list
-            if journey.route.departure_station not in self.edges:
-                self.edges[journey.route.departure_station] = {}
-            if journey.route.arrival_station not in self.edges[journey.route.departure_station]:
-                self.edges[journey.route.departure_station][journey.route.arrival_station] = []
-            
-            #add the tuple to the list accordingly ->will have to iterate through list each time for the edges
-            self.edges[journey.route.departure_station][journey.route.arrival_station].append((journey.route.distance, journey.departure_date_time, journey.arrival_date_time))
-             
-            self.G.add_edge(journey.route.departure_station,journey.route.arrival_station,weight=journey.route.distance, departureTime=journey.departure_date_time,arrivalTime = journey.arrival_date_time)
-        #now we have self.journeys, so probs place in dictionary but careful with repeating edges at different times
-        #populate the graph with edges based on distance only and then apply a time penalty
+        #one edge per route, built once with the snapshot, the departures of each day are looked up by time_penalty
+        self.adjacency = self.timetable.adjacency
+        # Search state, indexed by station number (see find_optimal_path)
+        self.distance = None
+        self.arrival_time = None
+        self.predecessor = None
         
     def heuristic(self, departure_station, arrival_station):
         """
-            ->Takes two Station objects as inputs :  it is designed to guide the search in the right direction
+            ->Takes two station ids as inputs :  it is designed to guide the search in the right direction
             This heuristic has to mantain admissibility: to not miss the optimum
             ->Function defining the criterion telling the algorithm what node to go for based on a cost estimation
             ->Could add a combination of the time weight too but can keep simple with distance for now
+            ->The distances are precomputed for every pair of stations, so this is a lookup in the distance matrix
         """
-        lat1 = departure_station.latitude
-        long1 = departure_station.longitude
-        lat2 = arrival_station.latitude
-        long2 = arrival_station.longitude
-
-        lat1_rad =  radians(lat1)
-        long1_rad = radians(long1)
-        lat2_rad = radians(lat2)
-        long2_rad = radians(long2)
-
-        return acos(sin(lat1_rad)*sin(lat2_rad)+cos(lat1_rad)*cos(lat2_rad)*cos(long2_rad-long1_rad))*6371
+        return self.timetable.distances.distance(departure_station, arrival_station)
     
 
     def time_penalty(self, current_station, next_station, arrived_time):
@@ -85,35 +131,21 @@ class Graph():
         The penalty accounts for waiting time and journey duration.
         
         Args:
-        - current_station: The current node/station.
-        - next_station: The next node/station.
-        - arrived_time: The arrival time at the current node (from the previous journey).
+        - current_station: The id of the current node/station.
+        - next_station: The id of the next node/station.
+        - arrived_time: The arrival time at the current node (from the previous journey), in epoch seconds.
         
         Returns:
         - The minimum penalty (in hours) for the journey to the next node, considering waiting time and journey duration.
         """
-        # Get all journeys from current_station to next_station
-        if current_station not in self.edges or next_station not in self.edges[current_station]:
+        # The departures of each day are sorted: the first one that can be caught is found by bisection,
+        # and the following days are only searched if no journey is left
+        departure = self.next_departure(lambda day: day.edges.get(current_station, {}).get(next_station), arrived_time)
+        if departure is None:
             return float("inf")  # No valid journeys, high penalty
-        
-        possible_journeys = self.edges[current_station][next_station]
-        min_penalty = float("inf")
-
-        for journey in possible_journeys:
-            distance, departure_datetime, arrival_time = journey
-
-            if departure_datetime >= arrived_time:
-                # Calculate the waiting time
-                waiting_time = (departure_datetime - arrived_time).total_seconds() / 3600  # Convert to hours
-                journey_duration = (arrival_time - departure_datetime).total_seconds() / 3600 #Converto to hours
-                total_penalty = max(0, waiting_time) + journey_duration  # CHANGE THIS DEPENDING ON AVERAGE SPEED OF TRAINS
-
-                ###########>> WILL NEED TO ENSURE ARRIVAL TIME IS IN PROPORTION TO DISTANCE IF NOT THIS DOESNT MAKE SENSE, WILL NEED TO CHANGE penaly from distance to travel time
-                
-                #replace penalty with correct value if non infinity
-                min_penalty = min(min_penalty, total_penalty)
-        
-        return min_penalty
+
+        # Waiting time + journey duration, minimal for the departure arriving first
+        return (departure[0] - arrived_time) / 3600  # Convert to hours
     ###########################################################################################################
 
     def reconstruct_path(self, end_station):
@@ -122,20 +154,20 @@ class Graph():
         following the predecessor chain set during the A* search.
 
         Args:
-        - end_station: The end station (final node in the path).
+        - end_station: The number of the end station (final node in the path).
 
         Returns:
-        - A list of station names (or objects), representing the optimal path from start to end.
+        - A list of Station objects, representing the optimal path from start to end.
         """
         path = []
         current_station = end_station
         
-        # Traverse the predecessor chain to build the path from end to start
-        while current_station:
+        # Traverse the predecessor chain to build the path from end to start, -1 marking the start
+        while current_station != -1:
             # Insert at the beginning to maintain correct order (from start to end)
-            path.insert(0, current_station)
+            path.insert(0, self.stations[self.adjacency.station_ids[current_station]])
             # Move to the predecessor node
-            current_station = self.G.nodes[current_station]["predecessor"]
+            current_station = self.predecessor[current_station]
 
         return path
     
@@ -150,18 +182,29 @@ class Graph():
         - end_station: The ending station (as a Station object).
         
         Returns:
-        - The optimal path as a list of station names, or None if no valid path is found.
+        - The optimal path as a list of Station objects, or None if no valid path is found.
         """
+        adjacency = self.adjacency
+        if start_station.id not in adjacency or end_station.id not in adjacency:
+            return None
+        station_ids = adjacency.station_ids
+        offsets = adjacency.offsets
+        targets = adjacency.targets
+        weights = adjacency.weights
+        end_id = end_station.id
+
+        # The search runs on station numbers
+        start_station = adjacency.index[start_station.id]
+        end_station = adjacency.index[end_id]
 
-        # Set up the graph node attributes to default values
-        for node in self.G.nodes:
-            self.G.nodes[node]["distance"] = float("inf")
-            self.G.nodes[node]["arrivalTime"] = datetime.min
-            self.G.nodes[node]["predecessor"] = None
+        # Set up the search state to default values
+        self.distance = array('d', [float("inf")]) * len(adjacency)
+        self.arrival_time = array('q', [0]) * len(adjacency)
+        self.predecessor = array('q', [-1]) * len(adjacency)
 
         # Initialize start station
-        self.G.nodes[start_station]["distance"] = 0
-        self.G.nodes[start_station]["arrivalTime"] = self.depart_date_time
+        self.distance[start_station] = 0
+        self.arrival_time[start_station] = self.departure_time # epoch seconds
         
         # Priority queue for A*
         priorityQueue = []
@@ -173,28 +216,407 @@ class Graph():
             if current_station == end_station:
                 return self.reconstruct_path(current_station)  # Reconstructs the optimal path, probs change to include journey instead of station
             
-            # Iterate over neighbors
-            for neighbor in self.G.successors(current_station):
-                if neighbor not in self.edges[current_station]:
-                    continue  # No journeys defined for this edge, skip
-
+            current_id = station_ids[current_station]
+            current_distance = self.distance[current_station]
+            current_arrival = self.arrival_time[current_station]
+            # Iterate over neighbors, stored contiguously in the CSR arrays
+            for edge in range(offsets[current_station], offsets[current_station + 1]):
+                neighbor = targets[edge]
                 # Calculate time penalty
-                penalty = self.time_penalty(current_station, neighbor, self.G.nodes[current_station]["arrivalTime"])
+                penalty = self.time_penalty(current_id, station_ids[neighbor], current_arrival)
 
                 # Calculate edge weight with the penalty
-                edge_weight = self.G.edges[current_station, neighbor]["weight"]
-                total_weight = edge_weight + penalty
+                total_weight = weights[edge] + penalty
 
                 # Update the distance if this path is better
-                current_distance = self.G.nodes[current_station]["distance"]
                 new_distance = current_distance + total_weight
 
-                if new_distance < self.G.nodes[neighbor]["distance"]:
-                    self.G.nodes[neighbor]["distance"] = new_distance
-                    self.G.nodes[neighbor]["arrivalTime"] = self.G.nodes[current_station]["arrivalTime"] + timedelta(hours=penalty)
-                    self.G.nodes[neighbor]["predecessor"] = current_station
+                if new_distance < self.distance[neighbor]:
+                    self.distance[neighbor] = new_distance
+                    self.arrival_time[neighbor] = current_arrival + round(penalty * 3600)
+                    self.predecessor[neighbor] = current_station
 
                     # Add to the priority queue with the heuristic
-                    heapq.heappush(priorityQueue, (new_distance + self.heuristic(neighbor, end_station), neighbor))
+                    heapq.heappush(priorityQueue, (new_distance + self.heuristic(station_ids[neighbor], end_id), neighbor))
         
-        return None
\ No newline at end of file
+        return None
+
+    def to_networkx(self):
+        """
+        Exports the graph to networkx, for debugging and plotting only: networkx is not needed to route.
+        The nodes are the station ids, with the state of the last search as attributes
+        (distance, arrivalTime in epoch seconds, predecessor id).
+
+        Returns:
+        - A networkx DiGraph whose edges have the distance as weight.
+        """
+        import networkx as nx
+
+        adjacency = self.adjacency
+        G = nx.DiGraph()
+        for index, station_id in enumerate(adjacency.station_ids):
+            G.add_node(station_id)
+            if self.distance is not None:
+                predecessor = self.predecessor[index]
+                G.nodes[station_id]["distance"] = self.distance[index]
+                G.nodes[station_id]["arrivalTime"] = self.arrival_time[index]
+                G.nodes[station_id]["predecessor"] = adjacency.station_ids[predecessor] if predecessor != -1 else None
+            for edge in range(adjacency.offsets[index], adjacency.offsets[index + 1]):
+                G.add_edge(station_id, adjacency.station_ids[adjacency.targets[edge]], weight=adjacency.weights[edge])
+        return G
+
+    def arrival(self, station_id):
+        """
+        Returns the arrival time at a station found by the last search, in epoch seconds, or None if it was not reached.
+        """
+        index = self.adjacency.index.get(station_id)
+        if self.distance is None or index is None or self.distance[index] == float("inf"):
+            return None
+        return self.arrival_time[index]
+
+
+class ConnectionScan(TimetableSearch):
+    """
+        ->Answers earliest arrival queries with the Connection Scan Algorithm (CSA)
+        ->The connections are scanned once, in departure order, from the requested departure time
+            ->no priority queue and no graph: every journey is kept, even parallel departures on the same route
+            ->the next day is only loaded when the scan reaches its end without finding the destination
+        ->Same interface as Graph so both engines can be used by the journeys view
+    """
+
+    def __init__(self, start_point, end_point, depart_date_time, timetable=None, horizon=None):
+        """
+            ->start and end point correspond to a Station object
+        """
+        super().__init__(depart_date_time, timetable, horizon)
+
+    def scan(self, start_id, end_ids):
+        """
+        Runs the connection scan from start_id until no connection can improve the arrival at any of end_ids.
+        Scanning for several destinations at once answers one-to-many queries in a single pass.
+
+        Args:
+        - start_id: The id of the starting station.
+        - end_ids: The ids of the ending stations.
+
+        Returns:
+        - A dictionary station id -> (day partition, index) of the connection reaching it the earliest.
+        """
+        earliest_arrival = {start_id: self.departure_time}
+        in_connection = {}
+        unreachable = float("inf")
+        targets = set(end_ids)
+        # Latest arrival among the destinations, once all of them are reached
+        bound = unreachable
+
+        for offset, day_start in enumerate(self.day_starts):
+            # The connections of the following days cannot arrive earlier at the destinations
+            if day_start >= bound:
+                break
+
+            day = self.day(offset)
+            departure_times = day.departure_times
+            arrival_times = day.arrival_times
+            departure_stations = day.departure_stations
+            arrival_stations = day.arrival_stations
+
+            # Connections departing before the requested time can never be taken
+            for index in range(bisect_left(departure_times, self.departure_time), len(departure_times)):
+                departure = departure_times[index]
+                # Connections are sorted, the following ones cannot arrive earlier at the destinations
+                if departure >= bound:
+                    break
+
+                if earliest_arrival.get(departure_stations[index], unreachable) <= departure:
+                    arrival_station = arrival_stations[index]
+                    if arrival_times[index] < earliest_arrival.get(arrival_station, unreachable):
+                        earliest_arrival[arrival_station] = arrival_times[index]
+                        in_connection[arrival_station] = (day, index)
+                        if arrival_station in targets:
+                            bound = max(earliest_arrival.get(target, unreachable) for target in targets)
+
+        return in_connection
+
+    def itinerary(self, in_connection, start_id, end_id):
+        """
+        Follows the connections of a scan back from end_id.
+
+        Args:
+        - in_connection: The result of scan.
+        - start_id: The id of the starting station.
+        - end_id: The id of the ending station.
+
+        Returns:
+        - The list of the journey ids from start_id to end_id, or None if end_id was not reached.
+        """
+        if start_id == end_id or end_id not in in_connection:
+            return None
+
+        journey_ids = []
+        current_station = end_id
+        while current_station != start_id:
+            day, index = in_connection[current_station]
+            journey_ids.insert(0, day.journey_ids[index])
+            current_station = day.departure_stations[index]
+        return journey_ids
+
+    def find_optimal_path(self, start_station, end_station):
+        """
+        Find the earliest arrival itinerary between start_station and end_station.
+
+        Args:
+        - start_station: The starting station (as a Station object).
+        - end_station: The ending station (as a Station object).
+
+        Returns:
+        - The itinerary as a list of Journey objects, or None if no valid path is found.
+        """
+        start_id = start_station.id
+        end_id = end_station.id
+        journey_ids = self.itinerary(self.scan(start_id, [end_id]), start_id, end_id)
+        if journey_ids is None:
+            return None
+
+        journeys = Journey.objects.select_related('route__departure_station', 'route__arrival_station').in_bulk(journey_ids)
+        return [journeys[journey_id] for journey_id in journey_ids]
+
+
+class ProfileScan(TimetableSearch):
+    """
+        ->One-to-many profile search with the Connection Scan Algorithm: the earliest arrivals from one origin
+          at every station, for several departure times, in a single scan of the connections from the earliest one
+            ->each station keeps one arrival per departure time, never later for an earlier departure time,
+              so the departure times a connection serves are found by bisection
+            ->a connection improves the arrivals of a range of departure times at once
+        ->Each departure time keeps its own horizon: the days after it are not used for that departure
+    """
+
+    def __init__(self, depart_date_times, timetable=None, horizon=None):
+        """
+            ->depart_date_times are aware datetimes, sorted
+            ->horizon is the number of hours after each departure time whose days can be used
+        """
+        if horizon is None:
+            horizon = getattr(settings, 'ROUTER_HORIZON_HOURS', 24)
+        span = (depart_date_times[-1] - depart_date_times[0]).total_seconds() / 3600
+        super().__init__(depart_date_times[0], timetable, horizon + span)
+        self.departure_times = [int(depart_date_time.timestamp()) for depart_date_time in depart_date_times]
+        # Offset of the last day of the horizon of each departure time
+        self.last_offsets = [(local_day(depart_date_time + timedelta(hours=horizon)) - self.first_day).days
+                             for depart_date_time in depart_date_times]
+
+    def scan(self, start_id, end_ids):
+        """
+        Runs the profile scan from start_id until no connection can improve the arrival at any of end_ids.
+
+        Args:
+        - start_id: The id of the starting station.
+        - end_ids: The ids of the ending stations.
+
+        Returns:
+        - A dictionary station id -> list giving, for each departure time, the (day partition, index)
+          of the connection reaching it the earliest, or None.
+        """
+        count = len(self.departure_times)
+        unreachable = float("inf")
+        earliest_arrival = {start_id: list(self.departure_times)}
+        in_connection = {}
+        targets = set(end_ids)
+        # Latest arrival among the destinations, reached the latest from the last departure time
+        bound = unreachable
+        # First departure time whose horizon includes the current day: the arrivals of the previous ones are final
+        first = 0
+
+        for offset, day_start in enumerate(self.day_starts):
+            if day_start >= bound:
+                break
+            while first < count and self.last_offsets[first] < offset:
+                first += 1
+            if first == count:
+                break
+
+            day = self.day(offset)
+            departure_times = day.departure_times
+            arrival_times = day.arrival_times
+            departure_stations = day.departure_stations
+            arrival_stations = day.arrival_stations
+
+            for index in range(bisect_left(departure_times, self.departure_times[0]), len(departure_times)):
+                departure = departure_times[index]
+                if departure >= bound:
+                    break
+
+                arrivals = earliest_arrival.get(departure_stations[index])
+                if arrivals is None:
+                    continue
+                # The connection can be caught from the departure times first to last
+                last = bisect_right(arrivals, departure, first) - 1
+                if last < first:
+                    continue
+
+                arrival_station = arrival_stations[index]
+                station_arrivals = earliest_arrival.get(arrival_station)
+                if station_arrivals is None:
+                    station_arrivals = earliest_arrival[arrival_station] = [unreachable] * count
+                    in_connection[arrival_station] = [None] * count
+                # It arrives earlier for the departure times improved to last
+                improved = bisect_right(station_arrivals, arrival_times[index], first, last + 1)
+                if improved > last:
+                    continue
+                connections = in_connection[arrival_station]
+                for position in range(improved, last + 1):
+                    station_arrivals[position] = arrival_times[index]
+                    connections[position] = (day, index)
+                if arrival_station in targets:
+                    bound = max(earliest_arrival.get(target, [unreachable])[-1] for target in targets)
+
+        return in_connection
+
+    def itinerary(self, in_connection, start_id, end_id, position):
+        """
+        Follows the connections of a scan back from end_id, for one departure time.
+
+        Args:
+        - in_connection: The result of scan.
+        - start_id: The id of the starting station.
+        - end_id: The id of the ending station.
+        - position: The position of the departure time.
+
+        Returns:
+        - The list of the journey ids from start_id to end_id, or None if end_id was not reached.
+        """
+        if start_id == end_id or end_id not in in_connection or in_connection[end_id][position] is None:
+            return None
+
+        journey_ids = []
+        current_station = end_id
+        while current_station != start_id:
+            day, index = in_connection[current_station][position]
+            journey_ids.insert(0, day.journey_ids[index])
+            current_station = day.departure_stations[index]
+        return journey_ids
+
+
+class Raptor(TimetableSearch):
+    """
+        ->Multi-criteria router based on RAPTOR (Round-bAsed Public Transit Optimized Router)
+        ->Round k finds the earliest arrivals using k journeys, so k-1 transfers
+            ->each round only scans the routes serving the stations improved by the previous round
+            ->the next trip of a route is found by bisection in its departure array, no priority queue needed
+            ->the next day is only loaded when a route has no trip left that could improve an arrival
+        ->Returns the Pareto set of itineraries: one per number of transfers, as long as it arrives earlier
+    """
+
+    # Maximum number of transfers explored
+    max_transfers = 8
+
+    def __init__(self, start_point, end_point, depart_date_time, timetable=None, horizon=None):
+        """
+            ->start and end point correspond to a Station object
+        """
+        super().__init__(depart_date_time, timetable, horizon)
+
+    def rounds(self, start_id, end_id):
+        """
+        Runs the RAPTOR rounds from start_id.
+
+        Args:
+        - start_id: The id of the starting station.
+        - end_id: The id of the ending station.
+
+        Returns:
+        - A list with, for each round, a dictionary station id -> (journey id, previous station id, arrival time)
+          for the stations improved during that round.
+        """
+        routes = self.timetable.routes
+        routes_from = self.timetable.routes_from
+        unreachable = float("inf")
+
+        best_arrival = {start_id: self.departure_time}
+        previous_round = {start_id: best_arrival[start_id]}
+        labels = []
+
+        for _ in range(self.max_transfers + 1):
+            current_round = {}
+            parents = {}
+            for station_id, arrival in previous_round.items():
+                for route_id in routes_from.get(station_id, ()):
+                    arrival_id = routes[route_id][1]
+                    # Local and target pruning
+                    bound = min(best_arrival.get(arrival_id, unreachable), best_arrival.get(end_id, unreachable),
+                                current_round.get(arrival_id, unreachable))
+                    # First trip of the route that can still be caught, then the one arriving the earliest after it
+                    trip = self.next_departure(lambda day: day.trips.get(route_id), arrival, bound)
+                    if trip is not None:
+                        trip_arrival, day, index = trip
+                        current_round[arrival_id] = trip_arrival
+                        parents[arrival_id] = (day.trips[route_id][3][index], station_id, trip_arrival)
+
+            if not current_round:
+                break
+            best_arrival.update(current_round)
+            labels.append(parents)
+            previous_round = current_round
+
+        return labels
+
+    def find_pareto_paths(self, start_station, end_station):
+        """
+        Find the itineraries between start_station and end_station that are not dominated
+        on both the arrival time and the number of transfers.
+
+        Args:
+        - start_station: The starting station (as a Station object).
+        - end_station: The ending station (as a Station object).
+
+        Returns:
+        - A list of (number of transfers, list of Journey objects), by increasing number of transfers.
+        """
+        start_id = start_station.id
+        end_id = end_station.id
+        if start_id == end_id:
+            return []
+
+        labels = self.rounds(start_id, end_id)
+
+        paths = []
+        for last_round, parents in enumerate(labels):
+            # Only the rounds that improved the arrival at the destination give a new itinerary
+            if end_id not in parents:
+                continue
+            # A station boarded in round k was always improved in round k-1, so there is one label per round
+            journey_ids = []
+            current_station = end_id
+            for round_number in range(last_round, -1, -1):
+                journey_id, current_station, _ = labels[round_number][current_station]
+                journey_ids.insert(0, journey_id)
+            paths.append(journey_ids)
+
+        journeys = Journey.objects.select_related('route__departure_station', 'route__arrival_station').in_bulk(
+            [journey_id for journey_ids in paths for journey_id in journey_ids]
+        )
+        return [(len(journey_ids) - 1, [journeys[journey_id] for journey_id in journey_ids]) for journey_ids in paths]
+
+    def find_optimal_path(self, start_station, end_station):
+        """
+        Find the earliest arrival itinerary between start_station and end_station.
+
+        Args:
+        - start_station: The starting station (as a Station object).
+        - end_station: The ending station (as a Station object).
+
+        Returns:
+        - The itinerary as a list of Journey objects, or None if no valid path is found.
+        """
+        paths = self.find_pareto_paths(start_station, end_station)
+        if not paths:
+            return None
+        return paths[-1][1]
+
+
+# Routing engines that can be selected in the journeys search
+ENGINES = {
+    'astar': Graph,
+    'csa': ConnectionScan,
+    'raptor': Raptor,
+}
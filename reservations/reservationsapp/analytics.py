@@ -0,0 +1,99 @@
+"""
+This file contains the cache of the statistics reports of the collaborator dashboard (advanced_search)
+
+A report is cached by (type, start_date, end_date, keyword) along with version stamps:
+    - the "past" stamp covers the days before today, which only change when old data is edited,
+      so the reports of ranges ending before today are kept for settings.ANALYTICS_PAST_CACHE_TIMEOUT seconds
+    - the "live" stamp covers today and the following days, where bookings happen all the time,
+      so the reports of ranges reaching them also expire after settings.ANALYTICS_CACHE_TIMEOUT seconds
+The signals declared in signals.py renew the stamps of the days touched by a change.
+
+Versions are stored in the shared Django cache (see versions.py), so that the invalidations made by
+a worker or a management command reach every process. A missing stamp is renewed, never read as current.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .versions import current_versions, new_version
+
+# Cache keys of the version stamps and of the reports
+PAST_VERSION_KEY = 'analytics:past'
+LIVE_VERSION_KEY = 'analytics:live'
+REPORT_KEY = 'analytics:report:{}:{}:{}:{}:{}:{}'
+
+
+def report_key(type_search, start_date, end_date, keyword):
+    """
+    Returns the cache key and timeout of a report.
+
+    Args:
+        type_search (str): The type of report
+        start_date (date): The first day of the report
+        end_date (date): The end of the report
+        keyword (str): The keyword of the search
+
+    Returns:
+        tuple: The cache key and the timeout in seconds
+    """
+    versions = current_versions([PAST_VERSION_KEY, LIVE_VERSION_KEY])
+    if end_date <= timezone.localdate():
+        # The live stamp does not matter for a range entirely in the past
+        return (
+            REPORT_KEY.format(versions.get(PAST_VERSION_KEY), None, type_search, start_date, end_date, keyword),
+            getattr(settings, 'ANALYTICS_PAST_CACHE_TIMEOUT', 86400)
+        )
+    return (
+        REPORT_KEY.format(versions.get(PAST_VERSION_KEY), versions.get(LIVE_VERSION_KEY), type_search, start_date, end_date, keyword),
+        getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 60)
+    )
+
+
+def cached_report(view):
+    """
+    Decorator caching the JSON responses of a report view, read from the type, start_date, end_date and keyword
+    parameters. Requests whose dates cannot be parsed are not cached.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        start_date = parse_date(request.GET.get('start_date', '') or '')
+        end_date = parse_date(request.GET.get('end_date', '') or '')
+        if start_date is None or end_date is None:
+            return view(request, *args, **kwargs)
+
+        key, timeout = report_key(request.GET.get('type'), start_date, end_date, request.GET.get('keyword', ''))
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content, content_type='application/json')
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.content, timeout)
+        return response
+    return wrapper
+
+
+def invalidate_days(*days):
+    """
+    Marks the reports covering some days as outdated, after a change on their journeys, tickets or reservations.
+
+    Args:
+        days (date): The local days that changed
+    """
+    today = timezone.localdate()
+    if any(day < today for day in days):
+        # Every report covering a day before today, the live ones included
+        cache.set(PAST_VERSION_KEY, new_version(), None)
+    else:
+        cache.set(LIVE_VERSION_KEY, new_version(), None)
+
+
+def invalidate_reports():
+    """
+    Marks every report as outdated, after a change on the network (station or route names, routes removed...).
+    """
+    cache.set_many({PAST_VERSION_KEY: new_version(), LIVE_VERSION_KEY: new_version()}, None)
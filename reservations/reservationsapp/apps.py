@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReservationsappConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "reservationsapp"
+
+    def ready(self):
+        # Connect the receivers keeping the timetable snapshot up to date
+        from . import signals
@@ -0,0 +1,159 @@
+"""
+This file contains the batch journey planner, answering many (origin, destination, departure) queries at once
+
+The queries sharing an origin are answered by one-to-many profile scans (see ProfileScan), one scan for each
+window of their departure times no longer than the search horizon, instead of one scan per departure time.
+Large batches are spread over a pool of processes started by start_pool when the server process starts
+(see wsgi.py), before it serves any request: the workers are forked after the timetable snapshot and the days
+of the coming horizon are loaded, so that they start with the same days without querying the database.
+Later on, a worker rebuilds the days that changed by itself, like any other process.
+A request never forks nor closes the database connections: without a pool, the batch is answered in the process.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django import db
+from django.conf import settings
+from django.utils import timezone
+
+from .algorithms2 import ProfileScan
+from .timetable import get_timetable
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def search_from_origin(origin_id, depart_date_times, destination_ids, horizon=None):
+    """
+    Finds the earliest arrival itineraries from one origin to several destinations, for several departure times,
+    in a single profile scan.
+
+    Args:
+        origin_id (int): The id of the departure station
+        depart_date_times (list): The departure times, aware and sorted
+        destination_ids (list): The ids of the arrival stations
+        horizon (int): The search horizon in hours, ROUTER_HORIZON_HOURS by default
+
+    Returns:
+        dict: (departure time, destination id) -> list of journey ids, or None if the destination cannot be reached
+    """
+    scan = ProfileScan(depart_date_times, horizon=horizon)
+    in_connection = scan.scan(origin_id, destination_ids)
+    return {
+        (depart_date_time, destination_id): scan.itinerary(in_connection, origin_id, destination_id, position)
+        for position, depart_date_time in enumerate(depart_date_times)
+        for destination_id in destination_ids
+    }
+
+
+def _search_task(task):
+    return search_from_origin(*task)
+
+
+def _start_worker():
+    """ Runs in the pool to fork its workers """
+    return os.getpid()
+
+
+def departure_windows(depart_date_times, horizon=None):
+    """
+    Splits sorted departure times into windows no longer than the horizon: a profile scan reads every day
+    from the first departure time of its window to the horizon of the last one.
+    """
+    if horizon is None:
+        horizon = getattr(settings, 'ROUTER_HORIZON_HOURS', 24)
+    windows = []
+    for depart_date_time in depart_date_times:
+        if windows and depart_date_time - windows[-1][0] <= timedelta(hours=horizon):
+            windows[-1].append(depart_date_time)
+        else:
+            windows.append([depart_date_time])
+    return windows
+
+
+def start_pool():
+    """
+    Starts the process pool of the batch planner, when BATCH_ROUTING_WORKERS is more than 1.
+    It must be called when the server process starts, before it serves requests or starts threads:
+    the database connections are closed so that the forked workers do not share them.
+    """
+    global _pool, _pool_pid
+    workers = getattr(settings, 'BATCH_ROUTING_WORKERS', 1)
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            timetable = get_timetable()
+            today = timezone.localdate()
+            for offset in range(getattr(settings, 'ROUTER_HORIZON_HOURS', 24) // 24 + 2):
+                timetable.day(today + timedelta(days=offset))
+            db.connections.close_all()
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+            _pool_pid = os.getpid()
+            # The workers are forked now rather than by the first large batch, inside a request
+            _pool.submit(_start_worker).result()
+        return _pool
+
+
+def get_pool():
+    """
+    Returns the process pool started by start_pool in this process, or None.
+    """
+    with _pool_lock:
+        # A pool inherited from the parent of a forked process cannot be used
+        return _pool if _pool_pid == os.getpid() else None
+
+
+def drop_pool(pool):
+    """
+    Drops a broken pool: the next batches are answered in the process, until start_pool is called again.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def plan_batch(queries, horizon=None):
+    """
+    Answers a batch of journey queries.
+
+    Args:
+        queries (list): (origin id, destination id, departure datetime) tuples
+        horizon (int): The search horizon in hours, ROUTER_HORIZON_HOURS by default
+
+    Returns:
+        list: For each query, in the same order, the list of the journey ids of the itinerary, or None
+    """
+    origins = {}
+    for origin_id, destination_id, depart_date_time in queries:
+        depart_date_times, destination_ids = origins.setdefault(origin_id, (set(), set()))
+        depart_date_times.add(depart_date_time)
+        destination_ids.add(destination_id)
+    tasks = [(origin_id, window, sorted(destination_ids), horizon)
+             for origin_id, (depart_date_times, destination_ids) in origins.items()
+             for window in departure_windows(sorted(depart_date_times), horizon)]
+
+    workers = getattr(settings, 'BATCH_ROUTING_WORKERS', 1)
+    pool = get_pool()
+    results = None
+    if pool is not None and len(tasks) >= getattr(settings, 'BATCH_ROUTING_POOL_THRESHOLD', 64):
+        try:
+            results = list(pool.map(_search_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory...): the batch is answered in the process
+            drop_pool(pool)
+    if results is None:
+        results = [_search_task(task) for task in tasks]
+
+    itineraries = {}
+    for (origin_id, *_), result in zip(tasks, results):
+        for (depart_date_time, destination_id), journey_ids in result.items():
+            itineraries[(origin_id, destination_id, depart_date_time)] = journey_ids
+    return [itineraries[query] for query in queries]
@@ -0,0 +1,71 @@
+"""
+This file contains the station catalogue: the stations and routes of the network drawn on the reservation map
+
+The catalogue is built with a single query on the routes and their stations, each station being listed once,
+and serialized to JSON once per version of the network (the timetable stamp renewed by the signals when
+a station or a route changes, see timetable.py). Every process keeps the serialized catalogue of the
+current network; the page fetches it from a URL containing a hash of its content, which is the same in every
+process and after a restart while the network does not change, and which browsers can keep forever.
+"""
+import hashlib
+import json
+import threading
+
+from .models import Route
+from .timetable import NETWORK_VERSION_KEY
+from .versions import current_version
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def build_catalogue():
+    """
+    Returns the JSON of the catalogue: the stations used by the routes, once each, and the routes
+    as (id, departure station id, arrival station id).
+    """
+    stations = {}
+    routes = []
+    for row in Route.objects.order_by('id').values_list(
+        'id', 'departure_station_id', 'arrival_station_id',
+        'departure_station__city', 'departure_station__station_name', 'departure_station__latitude', 'departure_station__longitude',
+        'arrival_station__city', 'arrival_station__station_name', 'arrival_station__latitude', 'arrival_station__longitude'
+    ):
+        routes.append(row[:3])
+        stations.setdefault(row[1], row[3:7])
+        stations.setdefault(row[2], row[7:11])
+
+    return json.dumps({
+        'stations': [
+            {'id': station_id, 'city': city, 'station_name': station_name, 'latitude': latitude, 'longitude': longitude}
+            for station_id, (city, station_name, latitude, longitude) in sorted(stations.items())
+        ],
+        'routes': routes,
+    }).encode()
+
+
+def get_catalogue():
+    """
+    Returns the catalogue of the process, building it again if the network changed.
+
+    Returns:
+        tuple: The version of the catalogue, a hash of its content, and its JSON
+    """
+    global _catalogue
+    stamp = current_version(NETWORK_VERSION_KEY)
+    catalogue = _catalogue
+    if catalogue is not None and catalogue[0] == stamp:
+        return catalogue[1:]
+
+    with _catalogue_lock:
+        if _catalogue is None or _catalogue[0] != stamp:
+            content = build_catalogue()
+            _catalogue = (stamp, hashlib.sha256(content).hexdigest()[:16], content)
+        return _catalogue[1:]
+
+
+def catalogue_version():
+    """
+    Returns the version of the current catalogue, a hash of its content.
+    """
+    return get_catalogue()[0]
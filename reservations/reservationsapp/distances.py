@@ -0,0 +1,127 @@
+"""
+This file contains the matrix of the distances between every pair of stations
+
+The matrix is computed once per process with vectorized NumPy operations and stored as float32.
+It is rebuilt on the next access when a station is created, moved or deleted (see signals.py).
+NumPy is only imported when the matrix is first built, so that workers which never route do not load it.
+"""
+import threading
+from math import sin, cos, acos, radians
+
+from django.core.cache import cache
+
+from .versions import current_version, new_version
+
+# Mean radius of the Earth, in km
+EARTH_RADIUS = 6371
+
+# Cache key of the version stamp
+VERSION_KEY = 'stations:distances'
+
+
+def great_circle(lat1, long1, lat2, long2):
+    """
+    Computes the distance between two points as the crow flies, with the spherical law of cosines.
+    Coordinates are assumed in degrees so they are changed to rads.
+
+    Returns:
+        float: The distance in km
+    """
+    lat1_rad = radians(lat1)
+    long1_rad = radians(long1)
+    lat2_rad = radians(lat2)
+    long2_rad = radians(long2)
+
+    # Rounding errors may take the cosine slightly out of [-1, 1]
+    cosine = sin(lat1_rad)*sin(lat2_rad)+cos(lat1_rad)*cos(lat2_rad)*cos(long2_rad-long1_rad)
+    return acos(min(1.0, max(-1.0, cosine)))*EARTH_RADIUS
+
+
+class DistanceMatrix():
+    """
+    The distances between every pair of stations, in km
+
+    Attributes:
+        version (str): The version stamp when the matrix was built
+        index (dict): station id -> row and column of the station in the matrix
+        matrix (numpy.ndarray): float32 matrix of the distances
+    """
+
+    # Number of rows computed at once
+    block_size = 256
+
+    def __init__(self, stations, version=None):
+        """
+        Args:
+            stations (iterable): (id, latitude, longitude) of the stations, in degrees
+            version (str): The version stamp of the stations
+        """
+        import numpy
+
+        self.version = version
+        stations = list(stations)
+        self.index = {station_id: position for position, (station_id, _, _) in enumerate(stations)}
+
+        # Stations without coordinates are placed at distance 0 from every other one,
+        # which keeps the A* heuristic admissible
+        coordinates = numpy.radians(numpy.array([(latitude, longitude) for _, latitude, longitude in stations],
+                                                dtype=numpy.float64).reshape(-1, 2))
+        latitudes = coordinates[:, 0]
+        longitudes = coordinates[:, 1]
+        self.matrix = numpy.empty((len(stations), len(stations)), dtype=numpy.float32)
+        # Computed by blocks of rows so that the float64 intermediates stay small on large networks
+        for start in range(0, len(stations), self.block_size):
+            end = start + self.block_size
+            cosines = (numpy.outer(numpy.sin(latitudes[start:end]), numpy.sin(latitudes))
+                       + numpy.outer(numpy.cos(latitudes[start:end]), numpy.cos(latitudes))
+                       * numpy.cos(longitudes[numpy.newaxis, :] - longitudes[start:end, numpy.newaxis]))
+            distances = numpy.arccos(numpy.clip(cosines, -1.0, 1.0)) * EARTH_RADIUS
+            self.matrix[start:end] = numpy.nan_to_num(distances, nan=0.0)
+
+    def __contains__(self, station_id):
+        return station_id in self.index
+
+    def distance(self, departure_id, arrival_id):
+        """
+        Returns the distance between two stations.
+
+        Args:
+            departure_id (int): The id of the first station
+            arrival_id (int): The id of the second station
+
+        Returns:
+            float: The distance in km
+        """
+        return float(self.matrix[self.index[departure_id], self.index[arrival_id]])
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_distance_matrix():
+    """
+    Returns the distance matrix of the process, rebuilding it if a station changed.
+
+    Returns:
+        DistanceMatrix: The current matrix
+    """
+    global _matrix
+    from .models import Station
+
+    version = current_version(VERSION_KEY)
+    matrix = _matrix
+    if matrix is not None and matrix.version == version:
+        return matrix
+
+    with _matrix_lock:
+        if _matrix is None or _matrix.version != version:
+            _matrix = DistanceMatrix(Station.objects.values_list('id', 'latitude', 'longitude'), version)
+        return _matrix
+
+
+def invalidate_distances():
+    """
+    Marks the matrix as outdated, after a station was created, moved or deleted.
+    """
+    cache.set(VERSION_KEY, new_version(), None)
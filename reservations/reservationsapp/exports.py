@@ -0,0 +1,161 @@
+"""
+This file contains the streamed exports of the journeys, reservations and tickets (CSV or NDJSON)
+
+An export is read by keyset batches: each batch is a short query on the rows whose id follows the last one
+sent, ordered by id, through values_list. Memory stays flat whatever the number of rows, and no
+transaction or server-side cursor stays open between two batches, so a long download does not hold
+locks or an old snapshot of the database. The rows are written as they are read, by the export view
+(StreamingHttpResponse) and by the export_data command.
+"""
+import csv
+import json
+from datetime import date, datetime
+
+from django.db.models import Exists, OuterRef
+
+from .models import Journey, Reservation, Ticket
+from .timetable import day_bounds
+
+# Default number of rows read per query
+BATCH_SIZE = 2000
+
+# Formats of an export: content type and file extension
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Columns of each export, as (header, path read with values_list); the id comes first, it is the keyset
+EXPORTS = {
+    'journeys': [
+        ('id', 'id'),
+        ('route', 'route_id'),
+        ('departure_station', 'route__departure_station__city'),
+        ('arrival_station', 'route__arrival_station__city'),
+        ('departure_date_time', 'departure_date_time'),
+        ('arrival_date_time', 'arrival_date_time'),
+        ('occupancy', 'occupancy'),
+    ],
+    'reservations': [
+        ('id', 'id'),
+        ('if_number', 'if_number'),
+        ('reservation_date', 'reservation_date'),
+        ('client', 'client_id'),
+        ('username', 'client__user__username'),
+    ],
+    'tickets': [
+        ('id', 'id'),
+        ('if_number', 'if_number'),
+        ('reservation', 'reservation__if_number'),
+        ('journey', 'journey_id'),
+        ('route', 'journey__route_id'),
+        ('departure_date_time', 'journey__departure_date_time'),
+        ('first_name', 'passenger__first_name'),
+        ('last_name', 'passenger__last_name'),
+        ('car', 'car'),
+        ('seat', 'seat'),
+    ],
+}
+
+
+def export_queryset(kind, start_date=None, end_date=None, route_id=None):
+    """
+    Returns the rows of an export, filtered by days and route.
+    The journeys and tickets are filtered on the departure of the journey, the reservations on the day
+    they were made and on having a ticket on the route.
+
+    Args:
+        kind (str): One of EXPORTS
+        start_date (date): The first day exported, or None
+        end_date (date): The last day exported (included), or None
+        route_id (int): The route exported, or None for all of them
+
+    Returns:
+        QuerySet: The rows, not ordered yet
+    """
+    if kind == 'journeys':
+        queryset, departure, route = Journey.objects.all(), 'departure_date_time', 'route_id'
+    elif kind == 'tickets':
+        queryset, departure, route = Ticket.objects.all(), 'journey__departure_date_time', 'journey__route_id'
+    else:
+        queryset = Reservation.objects.all()
+        if start_date:
+            queryset = queryset.filter(reservation_date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(reservation_date__lte=end_date)
+        if route_id:
+            # Exists rather than a join, which would repeat the reservations having several tickets
+            queryset = queryset.filter(Exists(Ticket.objects.filter(reservation=OuterRef('pk'), journey__route_id=route_id)))
+        return queryset
+
+    if start_date:
+        queryset = queryset.filter(**{f'{departure}__gte': day_bounds(start_date)[0]})
+    if end_date:
+        queryset = queryset.filter(**{f'{departure}__lt': day_bounds(end_date)[1]})
+    if route_id:
+        queryset = queryset.filter(**{route: route_id})
+    return queryset
+
+
+def iter_rows(queryset, columns, batch_size=BATCH_SIZE):
+    """
+    Yields the values of the rows of a queryset, one keyset batch at a time.
+
+    Args:
+        queryset (QuerySet): The rows
+        columns (list): The paths read, the id first
+        batch_size (int): The number of rows per query
+
+    Yields:
+        tuple: The values of a row
+    """
+    last_id = None
+    while True:
+        batch = queryset if last_id is None else queryset.filter(pk__gt=last_id)
+        rows = list(batch.order_by('pk').values_list(*columns)[:batch_size])
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+
+def format_value(value):
+    """ Returns a value as written in an export, dates in ISO 8601 """
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, so that csv.writer produces the lines one by one.
+    """
+    def write(self, value):
+        return value
+
+
+def export_lines(kind, export_format, batch_size=BATCH_SIZE, **filters):
+    """
+    Yields the lines of an export.
+
+    Args:
+        kind (str): One of EXPORTS
+        export_format (str): One of FORMATS
+        batch_size (int): The number of rows per query
+        filters: start_date, end_date and route_id, see export_queryset
+
+    Yields:
+        str: The lines, ending with a newline
+    """
+    headers = [header for header, _ in EXPORTS[kind]]
+    columns = [path for _, path in EXPORTS[kind]]
+    rows = iter_rows(export_queryset(kind, **filters), columns, batch_size)
+
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow([format_value(value) for value in row])
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, map(format_value, row)))) + '\n'
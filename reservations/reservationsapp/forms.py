@@ -109,6 +109,7 @@ class JourneySearchForm(forms.Form):
     Fields:
         station (Station): The desired departure/arrival station
         choice (depart/arrivee): A choice to specify if the station is a departure or an arrival station for the query
+        engine (astar/csa/raptor): The algorithm used to search an itinerary
     """
     departure_station = forms.ModelChoiceField(queryset=Station.objects.all(), required=False, label="Gare de départ")
     arrival_station = forms.ModelChoiceField(queryset=Station.objects.all(), required=False, label="Gare d'arrivée")
@@ -123,6 +124,13 @@ class JourneySearchForm(forms.Form):
         )
     )
 
+    engine = forms.ChoiceField(
+        choices=[('astar', 'A* (gares)'), ('csa', 'Arrivée au plus tôt (trajets)'), ('raptor', 'Moins de correspondances (trajets)')],
+        required=False,
+        initial='astar',
+        label="Algorithme de recherche"
+    )
+
     def clean_depart_date_time(self):
         # Get the departure date/time from the form -> checked with isvalid method
         depart_date_time = self.cleaned_data.get('depart_date_time')
@@ -139,7 +147,21 @@ class JourneySearchForm(forms.Form):
 #Gestion de la réservation
 
 class ReservationForm(forms.ModelForm):
-    route = forms.ModelChoiceField(queryset=Route.objects.all(), label="Sélectionner une route")
+    """
+    A form to book a journey for some passengers.
+
+    The journeys are not listed in the page: the options of the journey field are loaded from the route and
+    the date chosen (api/get-journeys-for-route, see static/javascript/load_journeys.js), and the submitted
+    journey is only validated against the journeys of that route on that day.
+
+    Fields:
+        route (Route): The route travelled
+        date (Date): The day of the journey
+        journey (Journey): The journey booked
+        passengers (Passager): The passengers of the user travelling
+    """
+    route = forms.ModelChoiceField(queryset=Route.objects.select_related('departure_station', 'arrival_station'), label="Sélectionner une route")
+    date = forms.DateField(required=False, label="Sélectionner une date", widget=forms.DateInput(attrs={'type': 'date'}))
     journey = forms.ModelChoiceField(queryset=Journey.objects.none(), required=False, label="Sélectionner un trajet")
     passengers = forms.ModelMultipleChoiceField(
         queryset=Passager.objects.none(),  # This will be dynamically loaded based on user
@@ -149,18 +171,22 @@ class ReservationForm(forms.ModelForm):
 
     class Meta:
         model = Reservation
-        fields = ['route', 'journey', 'passengers']
+        fields = ['route', 'date', 'journey', 'passengers']
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super(ReservationForm, self).__init__(*args, **kwargs)
         if user:
             self.fields['passengers'].queryset = Passager.objects.filter(user=user)
-            self.fields['journey'].queryset = Journey.objects.all()  # Initially allow all, filter in view
+        self.fields['journey'].queryset = self.journeys_of_day()
 
-        # Add JavaScript controls dynamically
+        # Add JavaScript controls dynamically, loading the journeys of the route and the date
         self.fields['route'].widget.attrs.update({
-            'onchange': 'fetch_journeys(this.value);',
+            'onchange': 'loadJourneys();',
+            'class': 'form-control'
+        })
+        self.fields['date'].widget.attrs.update({
+            'onchange': 'loadJourneys();',
             'class': 'form-control'
         })
         self.fields['journey'].widget.attrs.update({
@@ -170,6 +196,26 @@ class ReservationForm(forms.ModelForm):
             'class': 'form-control'
         })
 
+    def journeys_of_day(self):
+        """
+        Returns the journeys the submitted journey is chosen from: those of the submitted route on the submitted day.
+
+        Returns:
+            QuerySet: The journeys, none when the form is not submitted or the route or the date is invalid
+        """
+        if not self.is_bound:
+            return Journey.objects.none()
+        route_id = str(self.data.get(self.add_prefix('route'), ''))
+        try:
+            day = self.fields['date'].clean(self.data.get(self.add_prefix('date')))
+        except ValidationError:
+            return Journey.objects.none()
+        if not route_id.isdigit() or day is None:
+            return Journey.objects.none()
+        return Journey.objects.filter(route_id=route_id, departure_date_time__date=day).select_related(
+            'route__departure_station', 'route__arrival_station'
+        ).order_by('departure_date_time')
+
     def clean_journey(self):
         route = self.cleaned_data.get('route')
         journey = self.cleaned_data.get('journey')
@@ -0,0 +1,99 @@
+"""
+This file contains the HTTP caching of the public timetable endpoints used by the reservation form
+(get_dates_for_route, get_trips_for_date, get_journeys_for_route)
+
+A response only depends on the version stamps of the timetable it reads (see timetable.py): the network,
+the journeys of a day, the free seats of a day... Its ETag is derived from these stamps and its
+Last-Modified is the time the latest one was set, so that:
+    - a browser or a proxy revalidating a response gets a 304 while the stamps did not change
+    - the JSON of a response is kept in a per-process LRU cache with its ETag, and served again
+      without reaching the database as long as the stamps are the same
+Responses may also be reused without revalidation for settings.TIMETABLE_CACHE_MAX_AGE seconds.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .versions import current_versions, version_time
+
+# Number of responses kept by each process
+RESPONSE_CACHE_SIZE = 1024
+
+
+class ResponseCache():
+    """
+    A per-process LRU cache of response bodies, each one valid for a single ETag.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        """ Returns the body stored for a key if it has the given ETag, None otherwise """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, etag, content):
+        with self._lock:
+            self._entries[key] = (etag, content)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_responses = ResponseCache(getattr(settings, 'TIMETABLE_RESPONSE_CACHE_SIZE', RESPONSE_CACHE_SIZE))
+
+
+def timetable_response(versions):
+    """
+    Decorator caching a JSON view on the version stamps of the timetable it reads.
+
+    Args:
+        versions (function): Takes the arguments of the view, returns the cache keys of the stamps it depends on
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            keys = versions(*args, **kwargs)
+            # Stamps never set since the cache was emptied start now, which is later than any change before
+            stamps = current_versions(keys)
+            values = [stamps.get(key) for key in keys]
+            key = (view.__name__, args, tuple(sorted(kwargs.items())))
+            etag = '"{}"'.format(hashlib.md5(repr((key, values)).encode()).hexdigest())
+            times = [version_time(value) for value in values]
+            # Stamps set by an older version of the application have no time, only the ETag is used then
+            last_modified = int(max(times)) if times and None not in times else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                content = _responses.get(key, etag)
+                if content is not None:
+                    response = HttpResponse(content, content_type='application/json')
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    _responses.set(key, etag, response.content)
+
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, public=True, max_age=getattr(settings, 'TIMETABLE_CACHE_MAX_AGE', 0))
+            return response
+        return wrapper
+    return decorator
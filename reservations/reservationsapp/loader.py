@@ -0,0 +1,223 @@
+"""
+This file contains the bulk loader of the timetable: stations, routes and journeys
+
+Two formats are read, line by line so that memory does not grow with the file:
+    - NDJSON, one fixture object per line in the shape of dump.json ({"model": ..., "pk": ..., "fields": {...}}),
+      the other models being skipped; a fixture is converted with `jq -c '.[]' dump.json`
+    - GTFS-like CSV, stations.csv (id, city, station_name, longitude, latitude), routes.csv
+      (id, departure_station, arrival_station) and journeys.csv (id, route, departure_date_time, arrival_date_time)
+
+The rows are upserted on their id with bulk_create(update_conflicts=True), one transaction per batch,
+so that running an import again updates the rows instead of failing. Unlike loaddata, save() and the signals
+are not called: the distances of the routes loaded, and of the routes of the stations updated, are computed here,
+and the caches they refresh are renewed once at the end of the import (see Loader.finish). The version stamps
+of these caches are shared, so the running server workers see the renewal.
+"""
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .distances import great_circle, invalidate_distances
+from .models import Station, Route, Journey
+from . import analytics, rollups, timetable
+
+# Default number of rows written per transaction
+BATCH_SIZE = 5000
+
+# Models loaded, in the order of their foreign keys, with the fields updated on a conflict
+MODELS = {
+    'station': (Station, ['city', 'station_name', 'longitude', 'latitude']),
+    'route': (Route, ['departure_station', 'arrival_station', 'distance']),
+    'journey': (Journey, ['route', 'departure_date_time', 'arrival_date_time']),
+}
+
+# Files of a CSV timetable, by model
+CSV_FILES = {'station': 'stations.csv', 'route': 'routes.csv', 'journey': 'journeys.csv'}
+
+
+def parse_float(value):
+    """ Returns a coordinate read from a file, None when it is empty """
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+def parse_moment(value):
+    """ Returns an aware datetime read from a file, naive values being in the current time zone like loaddata """
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def build_instance(name, pk, fields):
+    """
+    Returns the unsaved instance of a row.
+
+    Args:
+        name (str): One of MODELS
+        pk: The id of the row
+        fields (dict): The values of the row, foreign keys as ids
+
+    Returns:
+        Model: The instance
+    """
+    if name == 'station':
+        return Station(
+            id=int(pk), city=fields['city'], station_name=fields.get('station_name') or None,
+            longitude=parse_float(fields.get('longitude')), latitude=parse_float(fields.get('latitude'))
+        )
+    if name == 'route':
+        return Route(id=int(pk), departure_station_id=int(fields['departure_station']), arrival_station_id=int(fields['arrival_station']))
+    return Journey(
+        id=int(pk), route_id=int(fields['route']),
+        departure_date_time=parse_moment(fields['departure_date_time']),
+        arrival_date_time=parse_moment(fields['arrival_date_time'])
+    )
+
+
+def read_ndjson(path):
+    """
+    Yields the (model, pk, fields) of the rows of an NDJSON fixture, other models being skipped.
+    """
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            app_label, _, name = row['model'].partition('.')
+            if app_label == 'reservationsapp' and name in MODELS:
+                yield name, row['pk'], row['fields']
+
+
+def read_csv(path, name):
+    """
+    Yields the (model, pk, fields) of the rows of a CSV file of one model.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            yield name, row['id'], row
+
+
+def read_timetable(path):
+    """
+    Yields the (model, pk, fields) of the rows of a timetable: an NDJSON file, a CSV file named after
+    its model, or a directory of CSV files.
+    """
+    path = Path(path)
+    if path.is_dir():
+        for name, filename in CSV_FILES.items():
+            if (path / filename).exists():
+                yield from read_csv(path / filename, name)
+        return
+
+    for name, filename in CSV_FILES.items():
+        if path.name == filename:
+            yield from read_csv(path, name)
+            return
+    yield from read_ndjson(path)
+
+
+class Loader():
+    """
+    Upserts the rows of a timetable by batches, the parents of a batch being written before it.
+
+    Attributes:
+        batch_size (int): The number of rows written per transaction
+        buffers (dict): The instances waiting to be written, by model
+        counts (dict): The number of rows written, by model
+        days (set): The local days of the journeys written, before and after the import
+    """
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.buffers = {name: [] for name in MODELS}
+        self.counts = {name: 0 for name in MODELS}
+        self.days = set()
+        self.start = time.perf_counter()
+
+    def add(self, name, pk, fields):
+        """ Adds a row, writing its model's batch when it is full """
+        self.buffers[name].append(build_instance(name, pk, fields))
+        if len(self.buffers[name]) >= self.batch_size:
+            self.flush(name)
+
+    def flush(self, name):
+        """ Writes the waiting rows of a model, after those of the models it refers to """
+        for parent in MODELS:
+            if parent == name:
+                break
+            self.flush(parent)
+
+        instances = self.buffers[name]
+        if not instances:
+            return
+        self.buffers[name] = []
+        model, update_fields = MODELS[name]
+
+        with transaction.atomic():
+            if name == 'route':
+                self.set_distances(instances)
+            elif name == 'journey':
+                # The days the journeys leave, so that their statistics are computed again
+                previous = Journey.objects.filter(pk__in=[journey.pk for journey in instances]).values_list('departure_date_time', flat=True)
+                self.days.update(timetable.local_day(moment) for moment in previous)
+                self.days.update(timetable.local_day(journey.departure_date_time) for journey in instances)
+            model.objects.bulk_create(instances, update_conflicts=True, unique_fields=['id'], update_fields=update_fields)
+            if name == 'station':
+                # Stations already in the database may have moved, as in the Station save signal
+                self.update_route_distances([station.pk for station in instances])
+        self.counts[name] += len(instances)
+
+    def set_distances(self, routes):
+        """ Computes the distances of routes, as Route.save does, with one query for their stations """
+        station_ids = {route.departure_station_id for route in routes} | {route.arrival_station_id for route in routes}
+        coordinates = {pk: (latitude, longitude) for pk, latitude, longitude in
+                       Station.objects.filter(pk__in=station_ids).values_list('id', 'latitude', 'longitude')}
+        for route in routes:
+            departure = coordinates.get(route.departure_station_id, (None, None))
+            arrival = coordinates.get(route.arrival_station_id, (None, None))
+            route.distance = None if None in departure + arrival else great_circle(*departure, *arrival)
+
+    def update_route_distances(self, station_ids):
+        """ Computes again the distances of the routes departing from or arriving at some stations """
+        routes = list(Route.objects.filter(Q(departure_station_id__in=station_ids) | Q(arrival_station_id__in=station_ids))
+                      .only('id', 'departure_station_id', 'arrival_station_id'))
+        if routes:
+            self.set_distances(routes)
+            Route.objects.bulk_update(routes, ['distance'], batch_size=self.batch_size)
+
+    def finish(self):
+        """
+        Writes the remaining rows, moves the id sequences after the ids loaded and renews the caches
+        the signals would have refreshed.
+
+        Returns:
+            float: The duration of the import in seconds
+        """
+        for name in MODELS:
+            self.flush(name)
+
+        loaded = [MODELS[name][0] for name in MODELS if self.counts[name]]
+        statements = connection.ops.sequence_reset_sql(no_style(), loaded)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+        if self.counts['station']:
+            invalidate_distances()
+        if self.counts['station'] or self.counts['route']:
+            analytics.invalidate_reports()
+        timetable.invalidate_network()
+        if self.days:
+            rollups.mark_days(*self.days)
+        return time.perf_counter() - self.start
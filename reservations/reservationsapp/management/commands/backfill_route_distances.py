@@ -0,0 +1,47 @@
+"""
+Fills the distance column of the routes, computed from the coordinates of their stations
+
+Routes loaded from fixtures or created before the column existed have no distance.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reservationsapp.distances import great_circle
+from reservationsapp.models import Route
+
+
+class Command(BaseCommand):
+    help = "Computes and stores the distance of the routes that have none (or of every route with --all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute the distance of every route")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Number of routes updated per query")
+
+    def handle(self, *args, **options):
+        routes = Route.objects.order_by('id')
+        if not options['all']:
+            routes = routes.filter(distance__isnull=True)
+        rows = routes.values_list(
+            'id',
+            'departure_station__latitude', 'departure_station__longitude',
+            'arrival_station__latitude', 'arrival_station__longitude'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        updated = 0
+        chunk = []
+        for route_id, *coordinates in rows:
+            distance = None if None in coordinates else great_circle(*coordinates)
+            chunk.append(Route(id=route_id, distance=distance))
+            if len(chunk) == options['chunk_size']:
+                updated += self.update(chunk)
+                chunk = []
+        if chunk:
+            updated += self.update(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} routes updated"))
+
+    def update(self, chunk):
+        # One short transaction per chunk
+        with transaction.atomic():
+            Route.objects.bulk_update(chunk, ['distance'])
+        return len(chunk)
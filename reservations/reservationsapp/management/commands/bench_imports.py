@@ -0,0 +1,78 @@
+"""
+Startup cost audit of a worker
+
+Boots Django in fresh interpreters the way a WSGI worker does (settings, applications, middleware and URLconf)
+with python -X importtime, then reports the median import time, the slowest top-level imports,
+the peak memory and which heavy packages were loaded.
+The command fails if one of the packages passed to --forbid is loaded at boot.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Code run by every interpreter: boots a worker, then prints its peak memory and the heavy packages it loaded
+BOOT = """
+import resource, sys
+from importlib import import_module
+from django.core.wsgi import get_wsgi_application
+from django.conf import settings
+get_wsgi_application()
+import_module(settings.ROOT_URLCONF)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+print(",".join(name for name in sys.argv[1].split(",") if name in sys.modules))
+"""
+
+# Packages whose import is worth watching
+HEAVY_PACKAGES = "pandas,networkx,matplotlib,numpy,scipy"
+
+# "import time: self [us] | cumulative | imported package" lines
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+class Command(BaseCommand):
+    help = "Measures the import time and memory of a worker boot with python -X importtime"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Number of interpreters started, the median is reported")
+        parser.add_argument('--top', type=int, default=15, help="Number of slowest top-level imports listed")
+        parser.add_argument('--forbid', default='pandas,networkx,matplotlib,numpy',
+                            help="Comma separated packages that must not be loaded at boot")
+
+    def handle(self, *args, **options):
+        environment = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        totals = []
+        cumulative = {}
+        for _ in range(options['runs']):
+            process = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", BOOT, HEAVY_PACKAGES],
+                capture_output=True, text=True, env=environment, cwd=settings.BASE_DIR
+            )
+            if process.returncode:
+                raise CommandError(process.stderr[-2000:])
+
+            total = 0
+            for line in process.stderr.splitlines():
+                match = IMPORT_TIME.match(line)
+                # Only the imports made by the boot code itself, the nested ones are included in their time
+                if match and len(match.group(3)) == 1:
+                    total += int(match.group(2))
+                    cumulative.setdefault(match.group(4), []).append(int(match.group(2)))
+            totals.append(total)
+            peak_memory, loaded = process.stdout.split("\n")[:2]
+
+        self.stdout.write(f"worker boot imports: {statistics.median(totals) / 1000:.1f} ms "
+                          f"(median of {options['runs']}), peak memory {int(peak_memory) / 1024:.1f} MB")
+        slowest = sorted(cumulative.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+        for package, times in slowest[:options['top']]:
+            self.stdout.write(f"  {statistics.median(times) / 1000:8.1f} ms  {package}")
+
+        loaded = [package for package in loaded.split(",") if package]
+        self.stdout.write(f"heavy packages loaded at boot: {', '.join(loaded) or 'none'}")
+        forbidden = [package for package in loaded if package in options['forbid'].split(",")]
+        if forbidden:
+            raise CommandError(f"Loaded at boot: {', '.join(forbidden)}")
@@ -0,0 +1,87 @@
+"""
+Benchmark of the routing engines on synthetic networks
+
+For each engine, the command reports the p50/p99 latency of random earliest arrival queries,
+after the build time and peak memory of the timetable.
+The optimality of CSA and RAPTOR is tested against a brute-force reference in tests/test_routing.py.
+"""
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reservationsapp.algorithms2 import Graph, ConnectionScan, Raptor
+from reservationsapp.synthetic import SCALES, grid_timetable
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the routing engines on a synthetic network"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small', help="Preset number of stations and journeys")
+        parser.add_argument('--stations', type=int, help="Number of stations, overrides the scale")
+        parser.add_argument('--journeys', type=int, help="Number of journeys per day, overrides the scale")
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--engines', default='astar,csa,raptor')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        stations, journeys = SCALES[options['scale']]
+        stations = options['stations'] or stations
+        journeys = options['journeys'] or journeys
+        day = timezone.localdate()
+
+        # Build of the timetable: network generation excluded, day partition included
+        timetable = grid_timetable(stations, journeys, day, options['seed'])
+        tracemalloc.start()
+        begin = time.perf_counter()
+        partition = timetable.day(day)
+        build_time = time.perf_counter() - begin
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.stdout.write(f"{stations} stations, {len(timetable.routes)} routes, {len(partition.journey_ids)} journeys")
+        self.stdout.write(f"timetable build: {build_time * 1000:.1f} ms, peak memory {peak_memory / 2**20:.1f} MB")
+
+        generator = random.Random(options['seed'])
+        start_of_day = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+        queries = []
+        for _ in range(options['queries']):
+            start_id, end_id = generator.sample(list(timetable.stations), 2)
+            queries.append((start_id, end_id, start_of_day.replace(hour=generator.randrange(5, 20))))
+
+        for engine in options['engines'].split(','):
+            latencies = []
+            results = []
+            for start_id, end_id, depart_date_time in queries:
+                begin = time.perf_counter()
+                results.append(self.arrival(engine, timetable, start_id, end_id, depart_date_time))
+                latencies.append(time.perf_counter() - begin)
+            percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            self.stdout.write(f"{engine:>7}: p50 {percentiles[49] * 1000:8.2f} ms, p99 {percentiles[98] * 1000:8.2f} ms, "
+                              f"{sum(result is not None for result in results)}/{len(results)} reachable")
+
+    def arrival(self, engine, timetable, start_id, end_id, depart_date_time):
+        """
+        Runs one query with the engine, including its initialisation, and returns the arrival time (epoch seconds) or None.
+        The horizon is limited to the day of the synthetic timetable.
+        """
+        if engine == 'astar':
+            graph = Graph(None, None, depart_date_time, timetable=timetable, horizon=0)
+            path = graph.find_optimal_path(timetable.stations[start_id], timetable.stations[end_id])
+            return graph.arrival(end_id) if path else None
+        if engine == 'csa':
+            scan = ConnectionScan(None, None, depart_date_time, timetable=timetable, horizon=0)
+            in_connection = scan.scan(start_id, [end_id])
+            if end_id not in in_connection:
+                return None
+            day, index = in_connection[end_id]
+            return day.arrival_times[index]
+        if engine == 'raptor':
+            labels = Raptor(None, None, depart_date_time, timetable=timetable, horizon=0).rounds(start_id, end_id)
+            arrivals = [parents[end_id][2] for parents in labels if end_id in parents]
+            return arrivals[-1] if arrivals else None
+        raise CommandError(f"Unknown engine {engine}")
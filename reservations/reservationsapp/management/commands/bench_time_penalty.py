@@ -0,0 +1,85 @@
+"""
+Micro-benchmark of Graph.time_penalty on a dense synthetic timetable
+
+The bisection over the arrays of epoch seconds is compared to the former linear scan over
+lists of (distance, departure, arrival) tuples of datetimes.
+"""
+import random
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reservationsapp.algorithms2 import Graph
+from reservationsapp.synthetic import dense_timetable
+
+
+def linear_time_penalty(edges, current_station, next_station, arrived_time):
+    """
+    The former implementation of Graph.time_penalty, scanning every departure of the edge.
+    """
+    if current_station not in edges or next_station not in edges[current_station]:
+        return float("inf")
+
+    min_penalty = float("inf")
+    for distance, departure_datetime, arrival_time in edges[current_station][next_station]:
+        if departure_datetime >= arrived_time:
+            waiting_time = (departure_datetime - arrived_time).total_seconds() / 3600
+            journey_duration = (arrival_time - departure_datetime).total_seconds() / 3600
+            min_penalty = min(min_penalty, max(0, waiting_time) + journey_duration)
+    return min_penalty
+
+
+class Command(BaseCommand):
+    help = "Compares the bisection in Graph.time_penalty to a linear scan, on a dense synthetic timetable"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stations', type=int, default=20)
+        parser.add_argument('--neighbours', type=int, default=3)
+        parser.add_argument('--departures', type=int, default=500, help="Departures per link and per day")
+        parser.add_argument('--queries', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        timetable = dense_timetable(options['stations'], options['neighbours'], options['departures'], seed=options['seed'])
+        depart_date_time = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+        graph = Graph(None, None, depart_date_time, timetable=timetable, horizon=0)
+        edges = timetable.day(timezone.localdate()).edges
+
+        # Same departures, in the former representation
+        tzinfo = timezone.get_current_timezone()
+        legacy_edges = {
+            departure_id: {
+                arrival_id: [
+                    (distance, datetime.fromtimestamp(departure, tzinfo), datetime.fromtimestamp(arrival, tzinfo))
+                    for departure, arrival in zip(departures, arrivals)
+                ]
+                for arrival_id, (departures, arrivals, _, distance) in arrivals_by_station.items()
+            }
+            for departure_id, arrivals_by_station in edges.items()
+        }
+
+        generator = random.Random(options['seed'])
+        pairs = [(departure_id, arrival_id) for departure_id, arrivals in edges.items() for arrival_id in arrivals]
+        start = int(depart_date_time.timestamp())
+        queries = [(*generator.choice(pairs), start + generator.randrange(0, 24 * 3600)) for _ in range(options['queries'])]
+        legacy_queries = [(a, b, datetime.fromtimestamp(t, tzinfo)) for a, b, t in queries]
+
+        begin = time.perf_counter()
+        results = [graph.time_penalty(a, b, t) for a, b, t in queries]
+        bisect_time = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        legacy_results = [linear_time_penalty(legacy_edges, a, b, t) for a, b, t in legacy_queries]
+        linear_time = time.perf_counter() - begin
+
+        for result, legacy_result in zip(results, legacy_results):
+            if abs(result - legacy_result) > 1e-9:
+                self.stderr.write(f"Different penalties: {result} != {legacy_result}")
+                break
+
+        self.stdout.write(f"{len(pairs)} links, {options['departures']} departures per link, {len(queries)} queries")
+        self.stdout.write(f"linear scan : {linear_time / len(queries) * 1e6:9.2f} µs per call")
+        self.stdout.write(f"bisection   : {bisect_time / len(queries) * 1e6:9.2f} µs per call")
+        self.stdout.write(f"speed-up    : {linear_time / bisect_time:9.1f}x")
@@ -0,0 +1,46 @@
+"""
+Exports the journeys, reservations or tickets as CSV or NDJSON, to a file or to the standard output
+
+The rows are read by keyset batches and written as they come (see exports.py): memory stays flat and no
+transaction stays open, whatever the size of the export.
+"""
+import sys
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from reservationsapp.exports import BATCH_SIZE, EXPORTS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = "Streams the journeys, reservations or tickets as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS), help="Rows to export")
+        parser.add_argument('--format', choices=list(FORMATS), default='csv', help="Format of the export")
+        parser.add_argument('--start-date', type=date.fromisoformat, help="First day exported (YYYY-MM-DD)")
+        parser.add_argument('--end-date', type=date.fromisoformat, help="Last day exported, included (YYYY-MM-DD)")
+        parser.add_argument('--route', type=int, help="Id of the route exported")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows read per query")
+        parser.add_argument('--output', help="File written, the standard output by default")
+
+    def handle(self, *args, **options):
+        lines = export_lines(
+            options['kind'], options['format'], options['batch_size'],
+            start_date=options['start_date'], end_date=options['end_date'], route_id=options['route']
+        )
+        begin = time.perf_counter()
+        count = 0
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for line in lines:
+                output.write(line)
+                count += 1
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            duration = time.perf_counter() - begin
+            self.stdout.write(self.style.SUCCESS(f"{count} lines written to {options['output']} in {duration:.1f} s"))
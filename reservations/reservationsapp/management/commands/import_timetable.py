@@ -0,0 +1,35 @@
+"""
+Imports stations, routes and journeys from an NDJSON fixture or GTFS-like CSV files (see loader.py)
+
+Much faster than loaddata on a large timetable: the file is read line by line and the rows are upserted
+by batches, without calling save() and the signals. Running it again with the same file changes nothing.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from reservationsapp.loader import BATCH_SIZE, Loader, read_timetable
+
+
+class Command(BaseCommand):
+    help = "Upserts stations, routes and journeys from an NDJSON fixture, a CSV file or a directory of CSV files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file, stations.csv/routes.csv/journeys.csv, or a directory containing them")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows written per transaction")
+
+    def handle(self, *args, **options):
+        loader = Loader(options['batch_size'])
+        try:
+            for name, pk, fields in read_timetable(options['path']):
+                loader.add(name, pk, fields)
+        except OSError as error:
+            raise CommandError(f"Cannot read {options['path']}: {error}")
+        except (KeyError, ValueError) as error:
+            raise CommandError(f"Invalid row in {options['path']}: {error!r}")
+        duration = loader.finish()
+
+        total = sum(loader.counts.values())
+        for name, count in loader.counts.items():
+            self.stdout.write(f"{name}: {count} rows")
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} rows imported in {duration:.2f} s, {total / max(duration, 1e-9):.0f} rows/s"
+        ))
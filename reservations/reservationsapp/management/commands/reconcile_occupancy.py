@@ -0,0 +1,26 @@
+"""
+Rebuilds the occupancy counters of the journeys from their tickets
+
+The counters are updated with every ticket (see Ticket.save and signals.py), but writes bypassing the ORM
+can make them drift. All the counters are recomputed by a single aggregate UPDATE.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+
+from reservationsapp.models import Journey, count_tickets
+
+
+class Command(BaseCommand):
+    help = "Recomputes Journey.occupancy from the tickets in one aggregate query"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report the journeys whose counter is wrong")
+
+    def handle(self, *args, **options):
+        drifted = Journey.objects.annotate(tickets_count=Count('tickets')).exclude(occupancy=F('tickets_count')).count()
+        if options['check']:
+            self.stdout.write(f"{drifted} journey(s) with a wrong occupancy")
+            return
+
+        updated = Journey.objects.update(occupancy=count_tickets())
+        self.stdout.write(self.style.SUCCESS(f"{updated} journeys recounted, {drifted} were wrong"))
@@ -0,0 +1,31 @@
+"""
+Brings the daily rollups read by the statistics reports up to date
+
+Only the days changed since the last run are computed again (see rollups.py). Meant to be run regularly,
+every minute from cron for instance, as the reports of advanced_search only read the rollups.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from reservationsapp import rollups
+from reservationsapp.models import RollupChange, RollupState
+
+
+class Command(BaseCommand):
+    help = "Computes the daily rollups of the days changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Compute every day again")
+
+    def handle(self, *args, **options):
+        pending = RollupChange.objects.count()
+        begin = time.perf_counter()
+        count = rollups.refresh(rebuild=options['rebuild'])
+        duration = time.perf_counter() - begin
+
+        days = "every day" if count is None else f"{count} day(s)"
+        state = RollupState.objects.get(pk=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"{days} computed from {pending} change(s) in {duration * 1000:.1f} ms, last run {state.updated_at:%Y-%m-%d %H:%M:%S}"
+        ))
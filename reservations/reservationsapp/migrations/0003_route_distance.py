@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "reservationsapp",
+            "0002_remove_client_email_remove_client_first_name_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="route",
+            name="distance",
+            field=models.FloatField(
+                blank=True, editable=False, null=True, verbose_name="Distance (km)"
+            ),
+        ),
+    ]
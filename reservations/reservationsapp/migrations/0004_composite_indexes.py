@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-18 11:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservationsapp", "0003_route_distance"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="journey",
+            name="route",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="route",
+                to="reservationsapp.route",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="ticket",
+            name="journey",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tickets",
+                to="reservationsapp.journey",
+                verbose_name="Trajet",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="journey",
+            index=models.Index(
+                fields=["route", "departure_date_time"],
+                name="journey_route_departure_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="journey",
+            index=models.Index(
+                fields=["departure_date_time"], name="journey_departure_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                fields=["reservation_date"], name="reservation_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["journey", "reservation"], name="ticket_journey_reservation_idx"
+            ),
+        ),
+    ]
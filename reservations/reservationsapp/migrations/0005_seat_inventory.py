@@ -0,0 +1,92 @@
+# Generated by Django 4.2 on 2026-10-18 11:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_misplaced_tickets(apps, schema_editor):
+    """
+    Gives another seat to the tickets booked on the seat of an older ticket of the same journey,
+    or on a seat that does not exist in the train (the sample data has a 15th car), which the random
+    seat assignment allowed, so that the unique constraint can be created and the inventories
+    built from the tickets hold every one of them.
+    """
+    Ticket = apps.get_model("reservationsapp", "Ticket")
+    seated = Ticket.objects.filter(car__isnull=False, seat__isnull=False)
+    doubled = (
+        seated.values("journey_id", "car", "seat")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+        .values_list("journey_id", flat=True)
+    )
+    # 14 cars of 120 seats
+    outside = seated.exclude(car__range=(1, 14), seat__range=(1, 120)).values_list(
+        "journey_id", flat=True
+    )
+
+    moved = []
+    for journey_id in set(doubled) | set(outside):
+        tickets = list(Ticket.objects.filter(journey_id=journey_id).order_by("id"))
+        taken = {(ticket.car, ticket.seat) for ticket in tickets}
+        free_seats = (
+            (car, seat)
+            for car in range(1, 15)
+            for seat in range(1, 121)
+            if (car, seat) not in taken
+        )
+        seen = set()
+        for ticket in tickets:
+            if ticket.car is None or ticket.seat is None:
+                continue
+            if (
+                (ticket.car, ticket.seat) in seen
+                or not 1 <= ticket.car <= 14
+                or not 1 <= ticket.seat <= 120
+            ):
+                # Without a free seat left, the ticket has no seat rather than a wrong one
+                ticket.car, ticket.seat = next(free_seats, (None, None))
+                moved.append(ticket)
+            else:
+                seen.add((ticket.car, ticket.seat))
+    Ticket.objects.bulk_update(moved, ["car", "seat"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservationsapp", "0004_composite_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SeatInventory",
+            fields=[
+                (
+                    "journey",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="seat_inventory",
+                        serialize=False,
+                        to="reservationsapp.journey",
+                        verbose_name="Trajet",
+                    ),
+                ),
+                ("seats", models.BinaryField(default=bytes)),
+                (
+                    "free_seats",
+                    models.PositiveIntegerField(
+                        default=1680, verbose_name="Places libres"
+                    ),
+                ),
+                ("version", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(move_misplaced_tickets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="ticket",
+            constraint=models.UniqueConstraint(
+                fields=("journey", "car", "seat"), name="ticket_unique_seat"
+            ),
+        ),
+    ]
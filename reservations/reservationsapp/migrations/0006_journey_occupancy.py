@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 11:31
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_occupancy(apps, schema_editor):
+    """
+    Counts the tickets already sold for every journey, in a single UPDATE.
+    """
+    Journey = apps.get_model("reservationsapp", "Journey")
+    Ticket = apps.get_model("reservationsapp", "Ticket")
+    tickets = (
+        Ticket.objects.filter(journey=models.OuterRef("pk"))
+        .order_by()
+        .values("journey")
+        .annotate(count=models.Count("id"))
+    )
+    Journey.objects.update(
+        occupancy=Coalesce(models.Subquery(tickets.values("count")), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservationsapp", "0005_seat_inventory"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="journey",
+            name="occupancy",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Places vendues"
+            ),
+        ),
+        migrations.RunPython(count_occupancy, migrations.RunPython.noop),
+    ]
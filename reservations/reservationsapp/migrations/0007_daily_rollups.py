@@ -0,0 +1,169 @@
+# Generated by Django 4.2 on 2026-10-18 11:35
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Computes the rollups of the existing reservations and tickets, as rollups.compute() does,
+    so that the reports have their data without waiting for a first refresh_rollups run.
+    """
+    Reservation = apps.get_model("reservationsapp", "Reservation")
+    Ticket = apps.get_model("reservationsapp", "Ticket")
+    Route = apps.get_model("reservationsapp", "Route")
+    DailyReservations = apps.get_model("reservationsapp", "DailyReservations")
+    DailyRouteTickets = apps.get_model("reservationsapp", "DailyRouteTickets")
+    DailyStationTraffic = apps.get_model("reservationsapp", "DailyStationTraffic")
+    RollupState = apps.get_model("reservationsapp", "RollupState")
+
+    DailyReservations.objects.bulk_create(
+        DailyReservations(day=row["reservation_date"], reservations=row["count"])
+        for row in Reservation.objects.order_by()
+        .values("reservation_date")
+        .annotate(count=models.Count("id"))
+    )
+
+    route_tickets = list(
+        Ticket.objects.order_by()
+        .annotate(day=TruncDate("journey__departure_date_time"))
+        .values("day", "journey__route_id")
+        .annotate(count=models.Count("id"))
+    )
+    DailyRouteTickets.objects.bulk_create(
+        DailyRouteTickets(
+            day=row["day"], route_id=row["journey__route_id"], tickets=row["count"]
+        )
+        for row in route_tickets
+    )
+
+    route_stations = {
+        route_id: (departure_id, arrival_id)
+        for route_id, departure_id, arrival_id in Route.objects.values_list(
+            "id", "departure_station_id", "arrival_station_id"
+        )
+    }
+    traffic = {}
+    for row in route_tickets:
+        departure_id, arrival_id = route_stations[row["journey__route_id"]]
+        traffic.setdefault((row["day"], departure_id), [0, 0])[0] += row["count"]
+        traffic.setdefault((row["day"], arrival_id), [0, 0])[1] += row["count"]
+    DailyStationTraffic.objects.bulk_create(
+        DailyStationTraffic(
+            day=day, station_id=station_id, departures=departures, arrivals=arrivals
+        )
+        for (day, station_id), (departures, arrivals) in traffic.items()
+    )
+
+    # The next refresh only computes the days changed from now on
+    RollupState.objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservationsapp", "0006_journey_occupancy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyReservations",
+            fields=[
+                ("day", models.DateField(primary_key=True, serialize=False)),
+                ("reservations", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RollupChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RollupState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyStationTraffic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("departures", models.PositiveIntegerField(default=0)),
+                ("arrivals", models.PositiveIntegerField(default=0)),
+                (
+                    "station",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_traffic",
+                        to="reservationsapp.station",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyRouteTickets",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("tickets", models.PositiveIntegerField(default=0)),
+                (
+                    "route",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_tickets",
+                        to="reservationsapp.route",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dailystationtraffic",
+            constraint=models.UniqueConstraint(
+                fields=("day", "station"), name="daily_station_traffic_unique"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailyroutetickets",
+            constraint=models.UniqueConstraint(
+                fields=("day", "route"), name="daily_route_tickets_unique"
+            ),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
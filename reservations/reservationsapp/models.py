@@ -11,11 +11,12 @@ Models :
     Client
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.conf import settings
-import random
-from math import sin, cos, acos, radians
+
+from .seats import CAPACITY, BITMAP_BYTES
 
 def generate_if_number():
     """
@@ -84,34 +85,32 @@ class Route(models.Model):
     Fields:
         departure_station (Station): The departure station
         arrival_station (Station): The arrival station
-    Attributes:
-        distance (float): contains the distance between the stations in km
+        distance (Float): The distance between the stations in km, computed when the route is saved
+            and when one of its stations moves (see the backfill_route_distances command for older routes)
     """
     departure_station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='departure_station')
     arrival_station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='arrival_station')
+    distance = models.FloatField(null=True, blank=True, editable=False, verbose_name="Distance (km)")
     
     def get_distance(self):
         """
         A function to compute the distance bewteen the departure and arrival stations, as the crow flies.
-        Latitudes are assumed in degrees so they are changed to rads.
 
         Returns:
-            float: The distance in km
+            float: The distance in km, or None if a station has no coordinates
         """
-        lat1 = self.departure_station.latitude
-        long1 = self.departure_station.longitude
-        lat2 = self.arrival_station.latitude
-        long2 = self.arrival_station.longitude
+        from .distances import great_circle
 
-        lat1_rad =  radians(lat1)
-        long1_rad = radians(long1)
-        lat2_rad = radians(lat2)
-        long2_rad = radians(long2)
+        departure_station = self.departure_station
+        arrival_station = self.arrival_station
+        if None in (departure_station.latitude, departure_station.longitude, arrival_station.latitude, arrival_station.longitude):
+            return None
+        return great_circle(departure_station.latitude, departure_station.longitude,
+                            arrival_station.latitude, arrival_station.longitude)
 
-        return acos(sin(lat1_rad)*sin(lat2_rad)+cos(lat1_rad)*cos(lat2_rad)*cos(long2_rad-long1_rad))*6371
-    
-    # Variable to store the distance between the stations
-    distance = property(get_distance)
+    def save(self, *args, **kwargs):
+        self.distance = self.get_distance()
+        super(Route, self).save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.departure_station} - {self.arrival_station}"
@@ -124,16 +123,60 @@ class Journey(models.Model):
         route (Route): A route offered by the company
         departure_date_time (DateTime): The departure time and date
         arrival_date_time (DateTime): The arrival time and date
+        occupancy (Integer): The number of tickets sold for the journey, updated with the tickets
+            (see the reconcile_occupancy command to rebuild it)
 
     """
-    route = models.ForeignKey(Route, on_delete=models.CASCADE,related_name='route')
+    # Indexed by the composite (route, departure_date_time) index, which also serves the lookups on the route alone
+    route = models.ForeignKey(Route, on_delete=models.CASCADE,related_name='route', db_index=False)
     departure_date_time = models.DateTimeField(help_text="Date et heure de départ",)
     arrival_date_time = models.DateTimeField(help_text="Date et heure d'arrivée",)
+    occupancy = models.PositiveIntegerField(default=0, editable=False, verbose_name="Places vendues")
+
+    class Meta:
+        indexes = [
+            # Journeys of a route on a date range (get_trips_for_date, occupancy_rate)
+            models.Index(fields=['route', 'departure_date_time'], name='journey_route_departure_idx'),
+            # Journeys of the whole network on a date range (timetable days, statistics)
+            models.Index(fields=['departure_date_time'], name='journey_departure_idx'),
+        ]
+
+    @property
+    def available_seats(self):
+        return max(CAPACITY - self.occupancy, 0)
     
     def __str__(self):
         return f"Trajet de {self.route.departure_station} à {self.route.arrival_station} le {self.departure_date_time.strftime('%Y-%m-%d %H:%M')} - Arrivée le {self.arrival_date_time.strftime('%Y-%m-%d %H:%M')}"
 
 
+class SeatInventory(models.Model):
+    """
+    The seats taken on a journey, kept up to date by the functions of seats.py
+
+    Fields:
+        journey (Journey): The journey
+        seats (Binary): Bitmap of the taken seats, bit (car - 1) * 120 + (seat - 1) being set for a taken seat
+        free_seats (Integer): The number of free seats
+        version (Integer): Incremented on every change, a booking only writes the version it read
+    """
+    journey = models.OneToOneField(Journey, on_delete=models.CASCADE, primary_key=True, related_name='seat_inventory', verbose_name="Trajet")
+    seats = models.BinaryField(default=bytes)
+    free_seats = models.PositiveIntegerField(default=CAPACITY, verbose_name="Places libres")
+    version = models.PositiveIntegerField(default=0)
+
+    @property
+    def bitmap(self):
+        return int.from_bytes(self.seats, 'little')
+
+    @bitmap.setter
+    def bitmap(self, bitmap):
+        self.seats = bitmap.to_bytes(BITMAP_BYTES, 'little')
+        self.free_seats = CAPACITY - bin(bitmap).count("1")
+
+    def __str__(self):
+        return f"{self.free_seats} places libres - {self.journey}"
+
+
 class Reservation(models.Model):
     """
     A model representing a reservation made by a client for multiple journeys.
@@ -148,6 +191,12 @@ class Reservation(models.Model):
     if_number = models.CharField(max_length=6, default=generate_if_number, unique=True, verbose_name="Numéro de la réservation")
     journeys = models.ManyToManyField(Journey, related_name='reservations', verbose_name="Trajet")
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='reservations', verbose_name="Client")
+
+    class Meta:
+        indexes = [
+            # Reservations made on a date range (reservations_by_day)
+            models.Index(fields=['reservation_date'], name='reservation_date_idx'),
+        ]
     
     def __str__(self):
         return f"Réservation {self.if_number} pour {self.client.user.first_name} {self.client.user.last_name}"
@@ -169,14 +218,132 @@ class Ticket(models.Model):
     passenger = models.ForeignKey(Passager, on_delete=models.PROTECT, related_name='tickets', verbose_name="Passager")
     car = models.IntegerField(blank=True, null=True, verbose_name="Numéro de voiture")
     seat = models.IntegerField(blank=True, null=True, verbose_name="Numéro de place")
-    journey = models.ForeignKey(Journey, on_delete=models.CASCADE, related_name='tickets', verbose_name="Trajet")
+    # Indexed by the composite (journey, reservation) index, which also serves the lookups on the journey alone
+    journey = models.ForeignKey(Journey, on_delete=models.CASCADE, related_name='tickets', verbose_name="Trajet", db_index=False)
     reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='tickets', verbose_name="Réservation")
+
+    class Meta:
+        indexes = [
+            # Tickets of the journeys found through a join on the journeys, and of a journey in a reservation
+            models.Index(fields=['journey', 'reservation'], name='ticket_journey_reservation_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['journey', 'car', 'seat'], name='ticket_unique_seat'),
+        ]
     
     def save(self, *args, **kwargs):
-        if not self.pk:  
-            self.seat = random.randint(1, 120)
-            self.car = random.randint(1, 14)
-        super(Ticket, self).save(*args, **kwargs)
+        """
+        Books the seat of the ticket in the inventory of the journey: a free seat is allocated to a new ticket
+        without car or seat, and the given seat is checked otherwise (see seats.py).
+
+        Raises:
+            SeatUnavailable: If the seat is taken, does not exist in the train or the journey is full
+        """
+        from .seats import allocate_seats, claim_seats, release_seats
+
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = Ticket.objects.filter(pk=self.pk).values_list('journey_id', 'car', 'seat').first()
+            # Read by the receivers of signals.py
+            self._previous_journey_id = previous[0] if previous else None
+
+            if previous != (self.journey_id, self.car, self.seat):
+                if previous is not None and None not in previous:
+                    release_seats(previous[0], [previous[1:]])
+                if self.car is None or self.seat is None:
+                    [(self.car, self.seat)] = allocate_seats(self.journey_id, 1)
+                else:
+                    claim_seats(self.journey_id, [(self.car, self.seat)])
+            super(Ticket, self).save(*args, **kwargs)
+
+            # Occupancy counters of the journeys, the deletions are counted in signals.py
+            if previous is None or previous[0] != self.journey_id:
+                Journey.objects.filter(pk=self.journey_id).update(occupancy=models.F('occupancy') + 1)
+                if previous is not None:
+                    Journey.objects.filter(pk=previous[0], occupancy__gt=0).update(occupancy=models.F('occupancy') - 1)
     
     def __str__(self):
-        return f"Billet {self.if_number} pour {self.passenger.first_name} {self.passenger.last_name}"
\ No newline at end of file
+        return f"Billet {self.if_number} pour {self.passenger.first_name} {self.passenger.last_name}"
+
+
+
+class DailyReservations(models.Model):
+    """
+    The number of reservations made each day, computed by rollups.py
+
+    Fields:
+        day (Date): The day the reservations were made on
+        reservations (Integer): The number of reservations
+    """
+    day = models.DateField(primary_key=True)
+    reservations = models.PositiveIntegerField(default=0)
+
+
+class DailyRouteTickets(models.Model):
+    """
+    The number of tickets sold for the journeys of a route departing each day, computed by rollups.py
+
+    Fields:
+        day (Date): The departure day of the journeys (local time)
+        route (Route): The route of the journeys
+        tickets (Integer): The number of tickets
+    """
+    day = models.DateField()
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name='daily_tickets')
+    tickets = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'route'], name='daily_route_tickets_unique'),
+        ]
+
+
+class DailyStationTraffic(models.Model):
+    """
+    The number of passengers departing from and arriving at a station each day, computed by rollups.py
+
+    Fields:
+        day (Date): The departure day of the journeys (local time)
+        station (Station): The station
+        departures (Integer): The number of tickets of journeys departing from the station
+        arrivals (Integer): The number of tickets of journeys arriving at the station
+    """
+    day = models.DateField()
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='daily_traffic')
+    departures = models.PositiveIntegerField(default=0)
+    arrivals = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'station'], name='daily_station_traffic_unique'),
+        ]
+
+
+class RollupChange(models.Model):
+    """
+    A day whose rollups have to be computed again, recorded when one of its reservations, tickets or journeys changes
+
+    Fields:
+        day (Date): The day that changed
+    """
+    day = models.DateField()
+
+
+class RollupState(models.Model):
+    """
+    The progress of the rollups, stored in a single row
+
+    Fields:
+        updated_at (DateTime): The end of the last run
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+def count_tickets():
+    """
+    An expression counting the tickets of a journey, to update the occupancy of journeys in a single query:
+    Journey.objects.update(occupancy=count_tickets())
+    """
+    tickets = Ticket.objects.filter(journey=models.OuterRef('pk')).order_by().values('journey').annotate(count=models.Count('id'))
+    return Coalesce(models.Subquery(tickets.values('count')), 0)
@@ -0,0 +1,161 @@
+"""
+This file contains the keyset (cursor) pagination of the listings
+
+Instead of Paginator, which counts every row and reads the page with an OFFSET that grows with its number,
+a page is read from the position of the last row seen: rows whose ordering key (for example
+(departure_date_time, id)) comes after the cursor, through the index on the key. Every page costs the same,
+however deep it is. The cursors are opaque tokens given in the ?after= and ?before= parameters
+(?before=last gives the last page). The total is only counted on request, up to a limit.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+# Rows counted at most to show the size of a listing
+COUNT_LIMIT = 1000
+
+# Token of the last page of a listing, given as ?before=
+LAST_PAGE = 'last'
+
+
+def encode_cursor(values):
+    """ Returns the opaque token of a position, from the values of the ordering key """
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, fields):
+    """
+    Returns the values of the ordering key encoded in a token, or None if the token is invalid.
+
+    Args:
+        token (str): The token
+        fields (list): The model fields of the key, used to read the values back
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if len(values) != len(fields):
+            return None
+        return [field.to_python(value) for field, value in zip(fields, values)]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+
+def position_filter(keys, values, lookup):
+    """
+    Returns the filter selecting the rows after (lookup 'gt') or before (lookup 'lt') a position
+    in the ascending order of the keys: (k1 > v1) or (k1 = v1 and k2 > v2)...
+    """
+    condition = Q(**{f'{keys[-1]}__{lookup}': values[-1]})
+    for key, value in zip(reversed(keys[:-1]), reversed(values[:-1])):
+        condition = Q(**{f'{key}__{lookup}': value}) | (Q(**{key: value}) & condition)
+    return condition
+
+
+class KeysetPage():
+    """
+    A page of a keyset pagination.
+
+    Attributes:
+        object_list (list): The rows of the page
+        next_cursor (str): The token of the next page, None on the last page
+        previous_cursor (str): The token of the previous page, None on the first page
+        count (int): The number of rows of the listing, at most COUNT_LIMIT, None when it was not counted
+        count_is_exact (bool): False when the listing has more than COUNT_LIMIT rows
+    """
+    def __init__(self, object_list, next_cursor, previous_cursor, count=None, count_is_exact=False):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_is_exact = count_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator():
+    """
+    Paginates a queryset on an ordering key whose last field is unique, such as ('departure_date_time', 'id').
+
+    Attributes:
+        queryset (QuerySet): The rows to paginate
+        per_page (int): The number of rows per page
+        keys (list): The names of the fields of the key, in ascending order
+    """
+    def __init__(self, queryset, per_page, keys=('id',)):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = list(keys)
+        self.fields = [queryset.model._meta.get_field(key) for key in self.keys]
+
+    def position(self, row):
+        """ Returns the token of the position of a row """
+        return encode_cursor([getattr(row, field.attname) for field in self.fields])
+
+    def get_page(self, after_token=None, before_token=None, count=False):
+        """
+        Returns the page following the after_token, preceding the before_token, or the first page.
+        Invalid tokens give the first page.
+
+        Args:
+            after_token (str): The position the page follows
+            before_token (str): The position the page precedes, or LAST_PAGE
+            count (bool): Whether to count the rows of the listing, up to COUNT_LIMIT, with one more query
+
+        Returns:
+            KeysetPage: The page
+        """
+        values = decode_cursor(after_token, self.fields) if after_token else None
+        backwards = last_page = False
+        if values is None and before_token:
+            last_page = before_token == LAST_PAGE
+            values = None if last_page else decode_cursor(before_token, self.fields)
+            backwards = last_page or values is not None
+
+        queryset = self.queryset
+        if backwards:
+            if not last_page:
+                queryset = queryset.filter(position_filter(self.keys, values, 'lt'))
+            queryset = queryset.order_by(*[f'-{key}' for key in self.keys])
+        else:
+            if values is not None:
+                queryset = queryset.filter(position_filter(self.keys, values, 'gt'))
+            queryset = queryset.order_by(*self.keys)
+
+        # One more row than the page tells whether there is a page after it
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if (has_more and not backwards) or (backwards and not last_page):
+                next_cursor = self.position(rows[-1])
+            if (has_more and backwards) or (not backwards and values is not None):
+                previous_cursor = self.position(rows[0])
+        elif not backwards and values is not None:
+            # Nothing follows the cursor anymore (the rows after it were deleted): the previous page is the last one
+            previous_cursor = LAST_PAGE
+
+        if not count:
+            return KeysetPage(rows, next_cursor, previous_cursor)
+        total = self.queryset.order_by()[:COUNT_LIMIT + 1].count()
+        return KeysetPage(rows, next_cursor, previous_cursor, min(total, COUNT_LIMIT), total <= COUNT_LIMIT)
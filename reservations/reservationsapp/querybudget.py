@@ -0,0 +1,95 @@
+"""
+This file contains the query budgets of the views: the maximum number of SQL queries a request may run
+
+A view declares its budget with the @query_budget decorator. QueryBudgetMiddleware counts the queries of
+every request, template rendering included, through connection.execute_wrapper, which also works when
+DEBUG is off. A request going over the budget of its view raises QueryBudgetExceeded when
+settings.QUERY_BUDGET_RAISE is set (development, checks), and is only logged otherwise (production).
+
+The count_queries context manager gives the same count to scripts and tests, see tests/test_query_budgets.py.
+"""
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a request runs more queries than the budget of its view.
+    """
+
+
+def query_budget(max_queries):
+    """
+    Decorator declaring the maximum number of queries of a view, whatever the amount of data it shows.
+
+    Args:
+        max_queries (int): The budget, the session and user lookups included
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+class QueryCounter():
+    """
+    Execute wrapper counting the queries run on a connection.
+
+    Attributes:
+        count (int): The number of queries run
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(budget=None):
+    """
+    Counts the queries run on every database inside the block.
+
+    Args:
+        budget (int): Raises QueryBudgetExceeded at the end of the block if more queries were run
+
+    Yields:
+        QueryCounter: The counter, read after the block
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+    if budget is not None and counter.count > budget:
+        raise QueryBudgetExceeded(f"{counter.count} queries run, the budget is {budget}")
+
+
+class QueryBudgetMiddleware():
+    """
+    Checks the number of queries of the requests served by views declaring a budget.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with count_queries() as counter:
+            response = self.get_response(request)
+
+        budget = getattr(request, 'query_budget', None)
+        if budget is not None and counter.count > budget:
+            message = f"{request.method} {request.path} ran {counter.count} queries, the budget is {budget}"
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The decorators of the view (login_required...) keep the attribute through functools.wraps
+        request.query_budget = getattr(view_func, 'query_budget', None)
@@ -0,0 +1,143 @@
+"""
+This file contains the daily rollups read by the statistics reports (advanced_search)
+
+Three tables are aggregated by day: the reservations made (DailyReservations), the tickets of each route
+(DailyRouteTickets) and the passengers of each station (DailyStationTraffic), the last two by departure day.
+
+The signals record the days touched by a change in RollupChange. refresh() only computes those days again,
+and deletes the changes it read, and only those: the changes recorded meanwhile are left for the next run.
+refresh() is called by the refresh_rollups command, to be run regularly (every minute from cron for instance):
+the reports only read the rollups, so they show the data of the last run. The rollups of the data existing
+when they were created are filled by their migration.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+from .analytics import invalidate_days, invalidate_reports
+from .models import Reservation, Ticket, Route, DailyReservations, DailyRouteTickets, DailyStationTraffic, RollupChange, RollupState
+from .timetable import day_bounds
+
+# Number of days computed, or changes deleted, by query, to stay below the limits on the number of query parameters
+DAYS_PER_QUERY = 500
+
+
+def mark_days(*days):
+    """
+    Records that the statistics of some days changed: their rollups are computed by the next refresh,
+    and the cached reports covering them are renewed.
+
+    Args:
+        days (date): The local days that changed
+    """
+    RollupChange.objects.bulk_create(RollupChange(day=day) for day in set(days))
+    invalidate_days(*days)
+
+
+def departure_ranges(field, days):
+    """
+    Returns a filter selecting the datetimes of a field in some local days, as one range per run of consecutive days.
+
+    Args:
+        field (str): The path of a datetime field
+        days (list): The days, sorted
+
+    Returns:
+        Q: The filter
+    """
+    condition = Q()
+    first = last = days[0]
+    for day in days[1:] + [None]:
+        if day is not None and day == last + timedelta(days=1):
+            last = day
+            continue
+        condition |= Q(**{f'{field}__gte': day_bounds(first)[0], f'{field}__lt': day_bounds(last)[1]})
+        first = last = day
+    return condition
+
+
+def compute(days=None):
+    """
+    Replaces the rollups of some days, or of every day, by aggregates of the reservations and the tickets.
+    Must be called inside a transaction.
+
+    Args:
+        days (list): The days to compute, sorted, or None for all of them
+    """
+    reservations = Reservation.objects.order_by()
+    tickets = Ticket.objects.order_by()
+    rollups = [DailyReservations.objects.all(), DailyRouteTickets.objects.all(), DailyStationTraffic.objects.all()]
+    if days is not None:
+        reservations = reservations.filter(reservation_date__in=days)
+        tickets = tickets.filter(departure_ranges('journey__departure_date_time', days))
+        rollups = [queryset.filter(day__in=days) for queryset in rollups]
+    for queryset in rollups:
+        queryset.delete()
+
+    DailyReservations.objects.bulk_create(
+        DailyReservations(day=row['reservation_date'], reservations=row['count'])
+        for row in reservations.values('reservation_date').annotate(count=Count('id'))
+    )
+
+    route_tickets = list(
+        tickets.annotate(day=TruncDate('journey__departure_date_time')).values('day', 'journey__route_id').annotate(count=Count('id'))
+    )
+    DailyRouteTickets.objects.bulk_create(
+        DailyRouteTickets(day=row['day'], route_id=row['journey__route_id'], tickets=row['count']) for row in route_tickets
+    )
+
+    # The passengers of a station are those of the routes departing from and arriving at it
+    route_stations = {route_id: (departure_id, arrival_id) for route_id, departure_id, arrival_id in
+                      Route.objects.values_list('id', 'departure_station_id', 'arrival_station_id')}
+    traffic = {}
+    for row in route_tickets:
+        departure_id, arrival_id = route_stations[row['journey__route_id']]
+        traffic.setdefault((row['day'], departure_id), [0, 0])[0] += row['count']
+        traffic.setdefault((row['day'], arrival_id), [0, 0])[1] += row['count']
+    DailyStationTraffic.objects.bulk_create(
+        DailyStationTraffic(day=day, station_id=station_id, departures=departures, arrivals=arrivals)
+        for (day, station_id), (departures, arrivals) in traffic.items()
+    )
+
+
+def refresh(rebuild=False):
+    """
+    Computes the rollups of the days changed since the last run, or of every day on the first run.
+
+    Args:
+        rebuild (bool): Computes every day again
+
+    Returns:
+        int: The number of days computed, or None if every day was
+    """
+    # Nothing to do, without locking anything
+    if not rebuild and not RollupChange.objects.exists() and RollupState.objects.exists():
+        return 0
+
+    with transaction.atomic():
+        state, created = RollupState.objects.select_for_update().get_or_create(pk=1)
+        # The changes committed after this read, whatever their id, are left for the next run
+        changes = list(RollupChange.objects.values_list('id', 'day'))
+
+        if rebuild or created:
+            count = None
+            compute()
+        else:
+            days = sorted({day for _, day in changes})
+            count = len(days)
+            for start in range(0, len(days), DAYS_PER_QUERY):
+                compute(days[start:start + DAYS_PER_QUERY])
+
+        ids = [change_id for change_id, _ in changes]
+        for start in range(0, len(ids), DAYS_PER_QUERY):
+            RollupChange.objects.filter(id__in=ids[start:start + DAYS_PER_QUERY]).delete()
+        state.save()
+
+    # The reports cached since the changes were recorded read the previous rollups
+    if count is None:
+        invalidate_reports()
+    elif days:
+        invalidate_days(*days)
+    return count
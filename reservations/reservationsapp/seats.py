@@ -0,0 +1,250 @@
+"""
+This file contains the seat inventory of the journeys
+
+The seats of a journey are stored as a bitmap in SeatInventory: bit (car - 1) * SEATS_PER_CAR + (seat - 1)
+is set when the seat is taken. Free seats are found with integer operations on the bitmap instead of
+scanning the tickets, and a group is seated next to each other in the same car whenever possible.
+
+Every change runs in a transaction: the inventory row is locked with select_for_update on the databases
+supporting it, and written back only if its version did not change meanwhile (SQLite ignores the lock).
+The unique constraint on the (journey, car, seat) of the tickets is the last guard against double bookings.
+"""
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+# Layout of a train
+CARS = 14
+SEATS_PER_CAR = 120
+CAPACITY = CARS * SEATS_PER_CAR
+BITMAP_BYTES = (CAPACITY + 7) // 8
+
+# Bitmaps of one car and of the whole train
+CAR_MASK = (1 << SEATS_PER_CAR) - 1
+TRAIN_MASK = (1 << CAPACITY) - 1
+
+# Number of times a change is retried when another booking updated the inventory first
+MAX_ATTEMPTS = 5
+
+
+class SeatUnavailable(Exception):
+    """
+    Raised when the requested seats are taken or the journey has not enough free seats.
+    """
+
+
+def seat_index(car, seat):
+    """
+    Returns the bit of a seat in the bitmap, or None if the seat does not exist in the train.
+    """
+    if not (1 <= car <= CARS and 1 <= seat <= SEATS_PER_CAR):
+        return None
+    return (car - 1) * SEATS_PER_CAR + seat - 1
+
+
+def seat_number(index):
+    """
+    Returns the (car, seat) of a bit of the bitmap.
+    """
+    car, seat = divmod(index, SEATS_PER_CAR)
+    return car + 1, seat + 1
+
+
+def find_free_seats(bitmap, count):
+    """
+    Finds free seats in a bitmap, side by side in a single car if possible.
+
+    Args:
+        bitmap (int): The taken seats
+        count (int): The number of seats wanted
+
+    Returns:
+        list: The (car, seat) of the free seats found
+
+    Raises:
+        SeatUnavailable: If the train has less than count free seats
+    """
+    if count <= 0:
+        return []
+
+    if 1 < count <= SEATS_PER_CAR:
+        for car in range(CARS):
+            free = ~(bitmap >> (car * SEATS_PER_CAR)) & CAR_MASK
+            # Bit i of runs is set when the seats i to i + count - 1 are all free
+            runs = free
+            for offset in range(1, count):
+                runs &= free >> offset
+            if runs:
+                first = (runs & -runs).bit_length() - 1
+                return [seat_number(car * SEATS_PER_CAR + first + offset) for offset in range(count)]
+
+    # Lowest free seats, one at a time
+    free = ~bitmap & TRAIN_MASK
+    seats = []
+    for _ in range(count):
+        if not free:
+            raise SeatUnavailable(f"Il ne reste que {len(seats)} place(s) libre(s) sur ce trajet.")
+        lowest = free & -free
+        seats.append(seat_number(lowest.bit_length() - 1))
+        free ^= lowest
+    return seats
+
+
+def tickets_bitmap(journey_id):
+    """
+    Builds the bitmap of a journey from its tickets, the seats outside of the train layout being ignored.
+    """
+    from .models import Ticket
+
+    bitmap = 0
+    for car, seat in Ticket.objects.filter(journey_id=journey_id, car__isnull=False, seat__isnull=False).values_list('car', 'seat'):
+        index = seat_index(car, seat)
+        if index is not None:
+            bitmap |= 1 << index
+    return bitmap
+
+
+def get_inventory(journey_id):
+    """
+    Returns the locked inventory of a journey, creating it from the tickets on first use.
+    Must be called inside a transaction.
+    """
+    from .models import SeatInventory
+
+    inventory = SeatInventory.objects.select_for_update().filter(pk=journey_id).first()
+    if inventory is not None:
+        return inventory
+
+    inventory = SeatInventory(journey_id=journey_id)
+    inventory.bitmap = tickets_bitmap(journey_id)
+    try:
+        with transaction.atomic():
+            inventory.save(force_insert=True)
+    except IntegrityError:
+        # Created by a concurrent booking
+        inventory = SeatInventory.objects.select_for_update().get(pk=journey_id)
+    return inventory
+
+
+def update_inventory(journey_id, change):
+    """
+    Applies a change to the bitmap of a journey, retrying if another booking changed it first.
+
+    Args:
+        journey_id (int): The id of the journey
+        change (function): Takes the current bitmap, returns the new bitmap and the result to give back
+
+    Returns:
+        The result of change
+    """
+    from .models import SeatInventory
+
+    for _ in range(MAX_ATTEMPTS):
+        with transaction.atomic():
+            inventory = get_inventory(journey_id)
+            bitmap, result = change(inventory.bitmap)
+            inventory.bitmap = bitmap
+            updated = SeatInventory.objects.filter(pk=journey_id, version=inventory.version).update(
+                seats=inventory.seats, free_seats=inventory.free_seats, version=F('version') + 1
+            )
+            if updated:
+                return result
+    raise SeatUnavailable("Le trajet est en cours de réservation, veuillez réessayer.")
+
+
+def allocate_seats(journey_id, count):
+    """
+    Books free seats on a journey.
+
+    Args:
+        journey_id (int): The id of the journey
+        count (int): The number of seats
+
+    Returns:
+        list: The (car, seat) booked
+
+    Raises:
+        SeatUnavailable: If the journey has not enough free seats
+    """
+    def allocate(bitmap):
+        seats = find_free_seats(bitmap, count)
+        for car, seat in seats:
+            bitmap |= 1 << seat_index(car, seat)
+        return bitmap, seats
+
+    return update_inventory(journey_id, allocate)
+
+
+def claim_seats(journey_id, seats):
+    """
+    Books given seats on a journey.
+
+    Args:
+        journey_id (int): The id of the journey
+        seats (list): The (car, seat) to book
+
+    Raises:
+        SeatUnavailable: If one of the seats is taken or does not exist in the train
+    """
+    def claim(bitmap):
+        for car, seat in seats:
+            index = seat_index(car, seat)
+            if index is None:
+                raise SeatUnavailable(f"La place {seat} de la voiture {car} n'existe pas dans ce train.")
+            if bitmap >> index & 1:
+                raise SeatUnavailable(f"La place {seat} de la voiture {car} est déjà réservée.")
+            bitmap |= 1 << index
+        return bitmap, None
+
+    update_inventory(journey_id, claim)
+
+
+def release_seats(journey_id, seats):
+    """
+    Frees seats of a journey, after their tickets were deleted or moved.
+
+    Args:
+        journey_id (int): The id of the journey
+        seats (list): The (car, seat) to free
+    """
+    def release(bitmap):
+        for car, seat in seats:
+            index = seat_index(car, seat)
+            if index is not None:
+                bitmap &= ~(1 << index)
+        return bitmap, None
+
+    update_inventory(journey_id, release)
+
+
+def book_tickets(reservation, journey, passengers):
+    """
+    Creates the tickets of several passengers on a journey, with a single update of the inventory.
+
+    Args:
+        reservation (Reservation): The reservation the tickets belong to
+        journey (Journey): The journey booked
+        passengers (list): The passengers to seat
+
+    Returns:
+        list: The created tickets
+
+    Raises:
+        SeatUnavailable: If the journey has not enough free seats
+    """
+    from .models import Journey, Ticket
+    from .rollups import mark_days
+    from .timetable import invalidate_seats
+
+    with transaction.atomic():
+        seats = allocate_seats(journey.pk, len(passengers))
+        tickets = Ticket.objects.bulk_create([
+            Ticket(reservation=reservation, journey=journey, passenger=passenger, car=car, seat=seat)
+            for passenger, (car, seat) in zip(passengers, seats)
+        ])
+        # bulk_create does not call Ticket.save, which counts the tickets of the journey, nor the signals
+        Journey.objects.filter(pk=journey.pk).update(occupancy=F('occupancy') + len(tickets))
+        day = timezone.localtime(journey.departure_date_time).date()
+        invalidate_seats(day)
+        mark_days(day)
+        return tickets
@@ -0,0 +1,128 @@
+"""
+This file contains the signal receivers keeping the shared caches in sync with the database
+"""
+from django.db.models import Q, F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Station, Route, Journey, Reservation, Ticket, SeatInventory, count_tickets
+from . import timetable, analytics, rollups
+from .distances import invalidate_distances
+from .seats import release_seats
+
+
+@receiver(pre_save, sender=Journey)
+def remember_journey_day(sender, instance, **kwargs):
+    """
+    Stores the day the journey departed on before the update, so that both days are refreshed.
+    """
+    instance._previous_departure = None
+    if instance.pk:
+        instance._previous_departure = Journey.objects.filter(pk=instance.pk).values_list('departure_date_time', flat=True).first()
+
+
+@receiver(post_save, sender=Journey)
+@receiver(post_delete, sender=Journey)
+def invalidate_journey_day(sender, instance, **kwargs):
+    """
+    Refreshes the timetable days and the statistics affected by a created, updated or deleted journey.
+    """
+    days = [timetable.local_day(instance.departure_date_time)]
+    previous = getattr(instance, '_previous_departure', None)
+    if previous is not None:
+        days.append(timetable.local_day(previous))
+    for day in days:
+        timetable.invalidate_day(day)
+    rollups.mark_days(*days)
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def invalidate_network(sender, instance, **kwargs):
+    """
+    Refreshes the whole timetable and the statistics when the network itself changes.
+    """
+    timetable.invalidate_network()
+    analytics.invalidate_reports()
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def invalidate_station_distances(sender, instance, **kwargs):
+    """
+    Refreshes the distance matrix when a station is created, moved or deleted.
+    """
+    invalidate_distances()
+
+
+@receiver(post_save, sender=Station)
+def update_route_distances(sender, instance, created, raw, **kwargs):
+    """
+    Recomputes the stored distance of the routes of a station that was updated, as it may have moved.
+    """
+    if created or raw:
+        return
+    routes = list(Route.objects.filter(Q(departure_station=instance) | Q(arrival_station=instance)).select_related('departure_station', 'arrival_station'))
+    for route in routes:
+        route.distance = route.get_distance()
+    Route.objects.bulk_update(routes, ['distance'])
+
+
+@receiver(post_delete, sender=Ticket)
+def release_ticket_seat(sender, instance, **kwargs):
+    """
+    Frees the seat of a deleted ticket in the inventory of its journey.
+    """
+    if instance.car is None or instance.seat is None:
+        return
+    # Without inventory, the bitmap is built from the remaining tickets on first use. The inventory is also
+    # already gone when the journey itself is being deleted, it must not be created again then
+    if SeatInventory.objects.filter(pk=instance.journey_id).exists():
+        release_seats(instance.journey_id, [(instance.car, instance.seat)])
+
+
+@receiver(post_delete, sender=Ticket)
+def decrement_occupancy(sender, instance, **kwargs):
+    """
+    Removes a deleted ticket from the occupancy of its journey, in the transaction of the deletion.
+    """
+    Journey.objects.filter(pk=instance.journey_id, occupancy__gt=0).update(occupancy=F('occupancy') - 1)
+
+
+@receiver(post_save, sender=Ticket)
+def reset_seat_inventory(sender, instance, raw, **kwargs):
+    """
+    Drops the inventory of the journey of a ticket loaded from a fixture, which bypasses Ticket.save:
+    it is rebuilt from the tickets on the next booking. The occupancy of the journey is counted again.
+    """
+    if raw:
+        SeatInventory.objects.filter(pk=instance.journey_id).delete()
+        Journey.objects.filter(pk=instance.journey_id).update(occupancy=count_tickets())
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_ticket_reports(sender, instance, **kwargs):
+    """
+    Refreshes the statistics and the free seats of the days of the journeys of a created, moved or deleted ticket.
+    """
+    journey_ids = {instance.journey_id, getattr(instance, '_previous_journey_id', None)} - {None}
+    # A journey being deleted with its tickets refreshes its own day
+    departures = Journey.objects.filter(pk__in=journey_ids).values_list('departure_date_time', flat=True)
+    days = [timetable.local_day(departure) for departure in departures]
+    for day in days:
+        timetable.invalidate_seats(day)
+    if days:
+        rollups.mark_days(*days)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_reservation_reports(sender, instance, **kwargs):
+    """
+    Refreshes the statistics of the day a reservation was made on.
+    """
+    if instance.reservation_date is not None:
+        rollups.mark_days(instance.reservation_date)
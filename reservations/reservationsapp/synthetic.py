@@ -0,0 +1,117 @@
+"""
+This file contains generators of synthetic networks, used to benchmark the routing algorithms
+without a database
+"""
+import math
+import random
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .distances import great_circle
+from .models import Station
+from .timetable import MemoryTimetable
+
+# Preset sizes of the networks used by bench_router: (stations, journeys per day)
+SCALES = {
+    'small': (50, 10_000),
+    'medium': (500, 100_000),
+    'large': (5_000, 1_000_000),
+}
+
+
+def dense_timetable(stations=20, neighbours=3, departures=500, day=None, seed=0):
+    """
+    Builds a network where every station is linked to its next neighbours,
+    each link being served many times during the day.
+
+    Args:
+        stations (int): Number of stations
+        neighbours (int): Number of stations reachable from each station
+        departures (int): Number of departures on each link during the day
+        day (date): The day of the timetable, today by default
+        seed (int): Seed of the random generator
+
+    Returns:
+        MemoryTimetable: The synthetic timetable
+    """
+    generator = random.Random(seed)
+    day = day or timezone.localdate()
+    start_of_day = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    station_objects = {
+        station_id: Station(id=station_id, city=f"Gare {station_id}",
+                            latitude=generator.uniform(43, 50), longitude=generator.uniform(-2, 7))
+        for station_id in range(1, stations + 1)
+    }
+
+    routes = {}
+    journeys = []
+    for departure_id in station_objects:
+        for offset in range(1, neighbours + 1):
+            arrival_id = (departure_id + offset - 1) % stations + 1
+            if arrival_id == departure_id:
+                continue
+            route_id = len(routes) + 1
+            routes[route_id] = (departure_id, arrival_id, float(offset * 50))
+            for _ in range(departures):
+                # Departures spread over the day, but all of them arriving the same day
+                departure = start_of_day + timedelta(minutes=generator.randrange(0, 20 * 60))
+                arrival = departure + timedelta(minutes=generator.randrange(30, 4 * 60))
+                journeys.append((len(journeys) + 1, route_id, departure, arrival))
+
+    return MemoryTimetable(station_objects, routes, journeys)
+
+
+def grid_timetable(stations=50, journeys=10_000, day=None, seed=0):
+    """
+    Builds a network of stations spread over France on a jittered grid, each station being linked both ways
+    to its neighbours on the grid. The journeys are spread randomly over the links and over the day,
+    with a duration depending on the distance.
+
+    Args:
+        stations (int): Number of stations
+        journeys (int): Number of journeys during the day
+        day (date): The day of the timetable, today by default
+        seed (int): Seed of the random generator
+
+    Returns:
+        MemoryTimetable: The synthetic timetable, whose journeys are given as epoch seconds
+    """
+    generator = random.Random(seed)
+    day = day or timezone.localdate()
+    start_of_day = int(timezone.make_aware(datetime.combine(day, datetime.min.time())).timestamp())
+
+    side = math.ceil(math.sqrt(stations))
+    station_objects = {}
+    for station_id in range(1, stations + 1):
+        row, column = divmod(station_id - 1, side)
+        station_objects[station_id] = Station(
+            id=station_id, city=f"Gare {station_id}",
+            latitude=43 + (row + generator.random()) * 7 / side,
+            longitude=-2 + (column + generator.random()) * 9 / side
+        )
+
+    routes = {}
+    for station_id, station in station_objects.items():
+        row, column = divmod(station_id - 1, side)
+        neighbours = [station_id + 1] if column + 1 < side else []
+        neighbours.append(station_id + side)
+        for neighbour_id in neighbours:
+            if neighbour_id not in station_objects:
+                continue
+            neighbour = station_objects[neighbour_id]
+            distance = great_circle(station.latitude, station.longitude, neighbour.latitude, neighbour.longitude)
+            for departure_id, arrival_id in ((station_id, neighbour_id), (neighbour_id, station_id)):
+                routes[len(routes) + 1] = (departure_id, arrival_id, distance)
+
+    route_ids = list(routes)
+    rows = []
+    for journey_id in range(1, journeys + 1):
+        route_id = generator.choice(route_ids)
+        # Between 5:00 and 23:00, at 100 to 250 km/h plus at least 10 minutes
+        departure = start_of_day + generator.randrange(5 * 3600, 23 * 3600, 60)
+        duration = 600 + int(routes[route_id][2] / generator.uniform(100, 250) * 3600)
+        rows.append((journey_id, route_id, departure, departure + duration))
+
+    return MemoryTimetable(station_objects, routes, rows)
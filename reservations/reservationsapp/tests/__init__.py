@@ -0,0 +1,13 @@
+"""
+Tests of the reservation application, run with `python manage.py test reservationsapp`
+
+The tests use a local-memory cache instead of the cache shared with the running server (see LOCAL_CACHES),
+so that the version stamps they renew do not reach it.
+"""
+
+LOCAL_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "reservationsapp-tests",
+    }
+}
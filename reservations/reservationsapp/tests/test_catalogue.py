@@ -0,0 +1,39 @@
+"""
+Tests of the station catalogue drawn on the reservation map
+"""
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from reservationsapp import catalogue
+from reservationsapp.models import Station, Route
+from reservationsapp.timetable import invalidate_network
+
+from . import LOCAL_CACHES
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CatalogueVersionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.paris = Station.objects.create(city='Paris', latitude=48.84, longitude=2.37)
+        cls.lyon = Station.objects.create(city='Lyon', latitude=45.76, longitude=4.86)
+        Route.objects.create(departure_station=cls.paris, arrival_station=cls.lyon)
+
+    def test_version_depends_on_the_content_only(self):
+        version = catalogue.catalogue_version()
+        # A new process, or a new network stamp without any change, gives the same version
+        catalogue._catalogue = None
+        invalidate_network()
+        self.assertEqual(catalogue.catalogue_version(), version)
+
+        Station.objects.filter(pk=self.lyon.pk).update(city='Lyon Part-Dieu')
+        invalidate_network()
+        self.assertNotEqual(catalogue.catalogue_version(), version)
+
+    def test_outdated_version_redirects(self):
+        version = catalogue.catalogue_version()
+        response = self.client.get(reverse('reservations:station_catalogue', kwargs={'version': 'outdated'}))
+        self.assertRedirects(response, reverse('reservations:station_catalogue', kwargs={'version': version}))
+        response = self.client.get(reverse('reservations:station_catalogue', kwargs={'version': version}))
+        self.assertEqual(response.json()['routes'], [[Route.objects.get().pk, self.paris.pk, self.lyon.pk]])
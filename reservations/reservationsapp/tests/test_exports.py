@@ -0,0 +1,67 @@
+"""
+Tests of the streamed exports
+"""
+import csv
+import io
+from datetime import datetime, timedelta
+from functools import partial
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from reservationsapp.exports import EXPORTS, export_lines
+from reservationsapp.models import Journey, Route, Station
+
+from . import LOCAL_CACHES
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ExportViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Creates journeys on both sides of each bound of February 2024, in local time.
+        """
+        cls.staff = User.objects.create(username='export_staff', is_staff=True)
+        stations = Station.objects.bulk_create(Station(city=f"Gare {index}") for index in range(2))
+        route = Route.objects.create(departure_station=stations[0], arrival_station=stations[1])
+        departures = [
+            datetime(2024, 1, 31, 23, 59), datetime(2024, 2, 1, 0, 0), datetime(2024, 2, 1, 8, 0),
+            *(datetime(2024, 2, day, 12, 0) for day in range(2, 29, 3)),
+            datetime(2024, 2, 29, 23, 59), datetime(2024, 3, 1, 0, 0), datetime(2024, 3, 2, 8, 0),
+        ]
+        journeys = Journey.objects.bulk_create(
+            Journey(route=route, departure_date_time=timezone.make_aware(departure),
+                    arrival_date_time=timezone.make_aware(departure + timedelta(hours=1)))
+            for departure in departures
+        )
+        cls.inside = [journey.id for journey in journeys[1:-2]]
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.url = reverse('reservations:export_data', kwargs={'kind': 'journeys'})
+
+    def test_invalid_dates_are_rejected(self):
+        for params in ({'start_date': 'tomorrow'}, {'end_date': '2024-02-30'}, {'start_date': '2024-13-01'}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_valid_dates_are_exported(self):
+        # Small batches, so that the rows of the export come from several keyset queries
+        with mock.patch('reservationsapp.views.export_lines', partial(export_lines, batch_size=4)), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'start_date': '2024-02-01', 'end_date': '2024-02-29'})
+            self.assertEqual(response.status_code, 200)
+            content = b''.join(response.streaming_content).decode()
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], [header for header, _ in EXPORTS['journeys']])
+        self.assertEqual([int(row[0]) for row in rows[1:]], self.inside)
+        batches = [query for query in queries.captured_queries if 'reservationsapp_journey' in query['sql']]
+        self.assertEqual(len(batches), len(self.inside) // 4 + 1)
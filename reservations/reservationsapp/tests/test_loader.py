@@ -0,0 +1,26 @@
+"""
+Tests of the bulk loader of the timetable
+"""
+from django.test import TestCase, override_settings
+
+from reservationsapp.distances import great_circle
+from reservationsapp.loader import Loader
+from reservationsapp.models import Station, Route
+
+from . import LOCAL_CACHES
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class LoaderTests(TestCase):
+
+    def test_moved_station_updates_the_distances_of_its_routes(self):
+        paris = Station.objects.create(city='Paris', latitude=48.84, longitude=2.37)
+        lyon = Station.objects.create(city='Lyon', latitude=45.76, longitude=4.86)
+        route = Route.objects.create(departure_station=paris, arrival_station=lyon)
+
+        loader = Loader()
+        loader.add('station', lyon.pk, {'city': 'Marseille', 'latitude': '43.30', 'longitude': '5.38'})
+        loader.finish()
+
+        route.refresh_from_db()
+        self.assertAlmostEqual(route.distance, great_circle(48.84, 2.37, 43.30, 5.38))
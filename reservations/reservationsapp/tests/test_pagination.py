@@ -0,0 +1,57 @@
+"""
+Tests of the keyset pagination of the listings (see pagination.py)
+"""
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from reservationsapp.models import Station
+from reservationsapp.pagination import LAST_PAGE, KeysetPaginator
+
+from . import LOCAL_CACHES
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stations = Station.objects.bulk_create(Station(city=f"Gare {index}") for index in range(25))
+
+    def setUp(self):
+        self.paginator = KeysetPaginator(Station.objects.all(), 10)
+
+    def test_pages_follow_each_other(self):
+        first = self.paginator.get_page()
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+        self.assertEqual([station.id for page in (first, second, third) for station in page],
+                         [station.id for station in self.stations])
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual(list(self.paginator.get_page(before_token=third.previous_cursor)), list(second))
+
+    def test_count_is_opt_in(self):
+        with CaptureQueriesContext(connection) as queries:
+            page = self.paginator.get_page()
+        self.assertEqual(len(queries), 1)
+        self.assertIsNone(page.count)
+
+        with CaptureQueriesContext(connection) as queries:
+            page = self.paginator.get_page(count=True)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual((page.count, page.count_is_exact), (25, True))
+
+    def test_empty_page_after_deleted_rows_links_to_the_last_page(self):
+        second = self.paginator.get_page(self.paginator.get_page().next_cursor)
+        Station.objects.filter(id__gt=self.stations[9].id).delete()
+
+        page = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(list(page), [])
+        self.assertFalse(page.has_next())
+        self.assertEqual(page.previous_cursor, LAST_PAGE)
+
+        last = self.paginator.get_page(before_token=page.previous_cursor)
+        self.assertEqual([station.id for station in last], [station.id for station in self.stations[:10]])
+        self.assertFalse(last.has_next())
+        self.assertFalse(last.has_previous())
@@ -0,0 +1,100 @@
+"""
+Tests that the reservation pages stay within their query budget (see querybudget.py) whatever the amount of data
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from reservationsapp.models import Station, Route, Journey, Client, Passager, Reservation, Ticket
+from reservationsapp.querybudget import QueryBudgetExceeded, count_queries
+
+from . import LOCAL_CACHES
+
+PAGES = ['reservations', 'reservation_detail']
+
+
+@override_settings(CACHES=LOCAL_CACHES, QUERY_BUDGET_RAISE=False)
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Creates a client with two passengers, a collaborator and a few journeys.
+        """
+        cls.user = User.objects.create(username='budget_client')
+        cls.staff = User.objects.create(username='budget_staff', is_staff=True)
+        cls.customer = Client.objects.create(user=cls.user, address='')
+        cls.passengers = Passager.objects.bulk_create(
+            Passager(user=cls.user, first_name=f"Passager {index}", last_name='Budget') for index in range(2)
+        )
+        stations = Station.objects.bulk_create(Station(city=f"Gare {index}") for index in range(3))
+        routes = Route.objects.bulk_create(Route(departure_station=departure, arrival_station=arrival)
+                                           for departure, arrival in zip(stations, stations[1:]))
+        start = timezone.now() + timedelta(days=1)
+        cls.journeys = Journey.objects.bulk_create(
+            Journey(route=route, departure_date_time=start + timedelta(hours=index), arrival_date_time=start + timedelta(hours=index + 1))
+            for route in routes
+            for index in range(5)
+        )
+
+    def setUp(self):
+        self.seats = 0
+        self.reservation = None
+
+    def add_reservations(self, count):
+        """
+        Adds reservations of the client, each one on two journeys with a ticket per passenger.
+        """
+        reservations = Reservation.objects.bulk_create(Reservation(client=self.customer) for _ in range(count))
+        self.reservation = self.reservation or reservations[0]
+        for index, reservation in enumerate(reservations):
+            journeys = [self.journeys[index % len(self.journeys)], self.journeys[(index + 1) % len(self.journeys)]]
+            reservation.journeys.add(*journeys)
+            tickets = []
+            for journey in journeys:
+                for passenger in self.passengers:
+                    self.seats += 1
+                    tickets.append(Ticket(reservation=reservation, journey=journey, passenger=passenger,
+                                          car=1 + self.seats // 100, seat=1 + self.seats % 100))
+            Ticket.objects.bulk_create(tickets)
+        # The detail page shows the first reservation, which gets more tickets for the second run
+        Ticket.objects.bulk_create(
+            Ticket(reservation=self.reservation, journey=journey, passenger=self.passengers[0], car=14, seat=self.seats % 120 + 1)
+            for journey in self.journeys[2:4]
+        )
+        self.seats += 1
+
+    def count_pages(self):
+        """
+        Returns the number of queries of each page, by (page, user, budget).
+        """
+        counts = {}
+        for user in (self.user, self.staff):
+            self.client.force_login(user)
+            for name in PAGES:
+                kwargs = {'if_number': self.reservation.if_number} if name == 'reservation_detail' else {}
+                url = reverse(f'reservations:{name}', kwargs=kwargs)
+                with count_queries() as counter:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, url)
+                counts[name, user.username, resolve(url).func.query_budget] = counter.count
+        return counts
+
+    def test_pages_stay_within_their_budget(self):
+        self.add_reservations(1)
+        before = self.count_pages()
+        self.add_reservations(20)
+        after = self.count_pages()
+        for (page, username, budget), count in after.items():
+            with self.subTest(page=page, user=username):
+                self.assertEqual(count, before[page, username, budget])
+                self.assertLessEqual(count, budget)
+
+    def test_count_queries_raises_over_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with count_queries(budget=1):
+                list(Station.objects.all())
+                list(Route.objects.all())
@@ -0,0 +1,74 @@
+"""
+Tests that the hot query shapes are answered with the indexes declared on the models
+
+Each query is explained (QuerySet.explain) and the plan has to read the expected indexes, on SQLite
+("USING INDEX", "USING COVERING INDEX") and PostgreSQL ("Index Scan using", "Index Only Scan using",
+"Bitmap Index Scan on"). On PostgreSQL sequential scans are disabled: on small tables the planner rightly
+prefers them, which would hide a missing index. The plans of the other databases are not checked.
+"""
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from reservationsapp.models import Journey, Reservation, Ticket
+
+from . import LOCAL_CACHES
+
+# How a plan reads an index, for each database whose plans are checked
+INDEX_USES = {
+    'sqlite': r'USING (?:COVERING )?INDEX {}\b',
+    'postgresql': r'(?:Index Scan using|Index Only Scan using|Bitmap Index Scan on) {}\b',
+}
+
+
+def hot_queries():
+    """
+    Returns the hot query shapes of the application.
+
+    Returns:
+        list: (description, queryset, names of the indexes the plan must use) tuples
+    """
+    start = timezone.now()
+    end = start + timedelta(days=1)
+    return [
+        ("journeys of a route on a date range",
+         Journey.objects.filter(route_id=1, departure_date_time__gte=start, departure_date_time__lt=end),
+         ['journey_route_departure_idx']),
+        ("journeys of the network on a day",
+         Journey.objects.filter(departure_date_time__gte=start, departure_date_time__lt=end)
+         .values_list('id', 'route_id', 'departure_date_time', 'arrival_date_time'),
+         ['journey_departure_idx']),
+        ("tickets of a journey",
+         Ticket.objects.filter(journey_id=1).values('id'),
+         ['ticket_journey_reservation_idx']),
+        ("tickets per journey on a date range, through the join",
+         Ticket.objects.filter(journey__departure_date_time__gte=start, journey__departure_date_time__lte=end)
+         .values('journey_id').annotate(count=Count('id')),
+         ['journey_departure_idx', 'ticket_journey_reservation_idx']),
+        ("tickets of a journey in a reservation",
+         Ticket.objects.filter(journey_id=1, reservation_id=1).values('id'),
+         ['ticket_journey_reservation_idx']),
+        ("reservations made on a date range",
+         Reservation.objects.filter(reservation_date__gte=start.date(), reservation_date__lt=end.date()),
+         ['reservation_date_idx']),
+    ]
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class QueryPlanTests(TestCase):
+
+    def test_hot_queries_use_their_indexes(self):
+        if connection.vendor not in INDEX_USES:
+            self.skipTest(f"The query plans of {connection.vendor} are not checked, only those of SQLite and PostgreSQL")
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        for description, queryset, indexes in hot_queries():
+            with self.subTest(description):
+                plan = queryset.explain()
+                for index in indexes:
+                    self.assertRegex(plan, INDEX_USES[connection.vendor].format(re.escape(index)))
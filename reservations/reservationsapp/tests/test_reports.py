@@ -0,0 +1,92 @@
+"""
+Tests that every report of advanced_search runs a constant number of queries, whatever the amount of data
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reservationsapp import rollups
+from reservationsapp.analytics import invalidate_reports
+from reservationsapp.models import Station, Route, Journey, Client, Passager, Reservation, Ticket
+from reservationsapp.views import advanced_search
+
+from . import LOCAL_CACHES
+
+REPORTS = ['reservations_by_day', 'reservations_by_route', 'occupancy_rate', 'station_frequency']
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ReportQueriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username='report_staff', is_staff=True)
+        today = timezone.localdate()
+        cls.start_date = today - timedelta(days=7)
+        cls.end_date = today + timedelta(days=7)
+
+    def request(self, report):
+        request = RequestFactory().get('/', {'type': report, 'start_date': self.start_date, 'end_date': self.end_date})
+        request.user = self.staff
+        return request
+
+    def prepare(self):
+        """
+        Rebuilds the rollups and drops the cached reports: the reports are measured, not their cached copy
+        nor the refresh of the rollups (the rows are added with bulk_create, which the signals do not see).
+        """
+        rollups.refresh(rebuild=True)
+        invalidate_reports()
+
+    def add_rows(self, stations_count=20, journeys_count=10):
+        """
+        Adds a line of stations served both ways, journeys every day of the period and tickets on them.
+        """
+        user = User.objects.create(username='report_client')
+        client = Client.objects.create(user=user, address='')
+        passenger = Passager.objects.create(user=user, first_name='Report', last_name='Check')
+
+        stations = Station.objects.bulk_create(Station(city=f"Gare {index}") for index in range(stations_count))
+        routes = Route.objects.bulk_create(
+            Route(departure_station=departure, arrival_station=arrival)
+            for first, second in zip(stations, stations[1:])
+            for departure, arrival in ((first, second), (second, first))
+        )
+        start = timezone.make_aware(timezone.datetime.combine(self.start_date, timezone.datetime.min.time()))
+        journeys = Journey.objects.bulk_create(
+            Journey(route=route, departure_date_time=start + timedelta(hours=index * 24 + 8),
+                    arrival_date_time=start + timedelta(hours=index * 24 + 10))
+            for route in routes
+            for index in range(journeys_count)
+        )
+        reservations = Reservation.objects.bulk_create(Reservation(client=client) for _ in journeys)
+        Ticket.objects.bulk_create(
+            Ticket(journey=journey, reservation=reservation, passenger=passenger)
+            for journey, reservation in zip(journeys, reservations)
+        )
+
+    def test_queries_do_not_depend_on_the_data(self):
+        self.prepare()
+        counts = {}
+        for report in REPORTS:
+            with CaptureQueriesContext(connection) as queries:
+                response = advanced_search(self.request(report))
+            self.assertEqual(response.status_code, 200)
+            counts[report] = len(queries)
+
+        self.add_rows()
+        self.prepare()
+        for report in REPORTS:
+            with self.subTest(report=report), self.assertNumQueries(counts[report]):
+                advanced_search(self.request(report))
+
+    def test_reports_are_cached(self):
+        self.prepare()
+        advanced_search(self.request('reservations_by_day'))
+        with self.assertNumQueries(0):
+            response = advanced_search(self.request('reservations_by_day'))
+        self.assertEqual(response.status_code, 200)
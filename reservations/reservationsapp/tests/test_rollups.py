@@ -0,0 +1,134 @@
+"""
+Tests of the daily rollups read by the statistics reports
+"""
+import json
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reservationsapp import rollups
+from reservationsapp.models import Client, DailyReservations, Journey, Passager, Reservation, RollupChange, Route, Station, Ticket
+from reservationsapp.views import advanced_search
+
+from . import LOCAL_CACHES
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RefreshTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='rollup_client', is_staff=True)
+        cls.customer = Client.objects.create(user=cls.user, address='')
+
+    def test_refresh_applies_the_recorded_changes(self):
+        rollups.refresh(rebuild=True)
+        Reservation.objects.create(client=self.customer)
+        Reservation.objects.create(client=self.customer)
+        self.assertTrue(RollupChange.objects.exists())
+
+        self.assertEqual(rollups.refresh(), 1)
+        self.assertFalse(RollupChange.objects.exists())
+        self.assertEqual(DailyReservations.objects.get(day=timezone.localdate()).reservations, 2)
+        self.assertEqual(rollups.refresh(), 0)
+
+    def test_reports_do_not_write(self):
+        rollups.refresh(rebuild=True)
+        Reservation.objects.create(client=self.customer)
+        today = timezone.localdate()
+        for report in ('reservations_by_day', 'occupancy_rate'):
+            request = RequestFactory().get('/', {'type': report, 'start_date': today, 'end_date': today})
+            request.user = self.user
+            with CaptureQueriesContext(connection) as queries:
+                advanced_search(request)
+            self.assertFalse([query for query in queries if not query['sql'].lstrip().upper().startswith('SELECT')], report)
+        self.assertTrue(RollupChange.objects.exists())
+
+    def test_refresh_renews_the_cached_reports(self):
+        rollups.refresh(rebuild=True)
+        today = timezone.localdate()
+        # The days of the report end before end_date
+        request = RequestFactory().get('/', {'type': 'reservations_by_day', 'start_date': today, 'end_date': today + timedelta(days=1)})
+        request.user = self.user
+        before = json.loads(advanced_search(request).content)
+
+        Reservation.objects.create(client=self.customer)
+        # Cached again before the refresh, with the previous rollups
+        self.assertEqual(json.loads(advanced_search(request).content), before)
+        rollups.refresh()
+        self.assertNotEqual(json.loads(advanced_search(request).content), before)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ReportPeriodTests(TestCase):
+    """
+    The reports cover the days from start_date included to end_date excluded.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Adds a ticket on a journey departing at noon on each day from start_date to end_date.
+        """
+        cls.user = User.objects.create(username='period_staff', is_staff=True)
+        customer = Client.objects.create(user=cls.user, address='')
+        passenger = Passager.objects.create(user=cls.user, first_name='Passager', last_name='Période')
+        stations = Station.objects.bulk_create(Station(city=f"Gare {index}") for index in range(2))
+        route = Route.objects.create(departure_station=stations[0], arrival_station=stations[1])
+        cls.start_date = timezone.localdate() - timedelta(days=10)
+        cls.end_date = cls.start_date + timedelta(days=2)
+        reservation = Reservation.objects.create(client=customer)
+        for offset in range(3):
+            departure = timezone.make_aware(datetime.combine(cls.start_date + timedelta(days=offset), time(12)))
+            journey = Journey.objects.create(route=route, departure_date_time=departure, arrival_date_time=departure + timedelta(hours=1))
+            Ticket.objects.create(reservation=reservation, journey=journey, passenger=passenger, car=1, seat=1 + offset)
+        rollups.refresh(rebuild=True)
+
+    def report(self, type_search):
+        request = RequestFactory().get('/', {'type': type_search, 'start_date': self.start_date, 'end_date': self.end_date})
+        request.user = self.user
+        return json.loads(advanced_search(request).content)
+
+    def test_end_date_is_excluded(self):
+        days = [point['name'] for point in self.report('reservations_by_day')['series'][0]['data']]
+        self.assertEqual(days, [str(self.start_date), str(self.start_date + timedelta(days=1))])
+        self.assertEqual([point['y'] for point in self.report('reservations_by_route')['series'][0]['data']], [2])
+        departures = [series['data'][0]['y'] for series in self.report('station_frequency')['series']]
+        self.assertEqual(departures, [2, 0])
+        self.assertEqual(sum(len(series['data']) for series in self.report('occupancy_rate')['series']), 2)
+
+
+class BackfillTests(TransactionTestCase):
+    """
+    The migration creating the rollups fills them with the existing data.
+    """
+    migrate_from = [('reservationsapp', '0006_journey_occupancy')]
+    migrate_to = [('reservationsapp', '0007_daily_rollups')]
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_migration_fills_the_rollups(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        User = apps.get_model('auth', 'User')
+        Client = apps.get_model('reservationsapp', 'Client')
+        Reservation = apps.get_model('reservationsapp', 'Reservation')
+        customer = Client.objects.create(user=User.objects.create(username='backfill_client'), address='')
+        Reservation.objects.bulk_create(Reservation(client=customer, if_number=f'BACK{index:02d}') for index in range(3))
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        DailyReservations = apps.get_model('reservationsapp', 'DailyReservations')
+        RollupState = apps.get_model('reservationsapp', 'RollupState')
+        self.assertEqual(DailyReservations.objects.get(day=timezone.localdate()).reservations, 3)
+        self.assertTrue(RollupState.objects.filter(pk=1).exists())
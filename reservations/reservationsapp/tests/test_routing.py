@@ -0,0 +1,196 @@
+"""
+Tests of the routing engines against a brute-force reference, on synthetic networks built without a database
+"""
+import random
+from datetime import datetime
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from reservationsapp.algorithms2 import ConnectionScan, Graph, ProfileScan, Raptor
+from reservationsapp.synthetic import dense_timetable, grid_timetable
+
+
+def reference_arrivals(day, start_id, departure_time, max_journeys):
+    """
+    Computes the earliest arrival at every station using at most 1, 2, ... max_journeys journeys,
+    by relaxing all the connections of the day once per round (Bellman-Ford on the connections).
+    The rounds stop early once the arrivals do not improve anymore.
+
+    Returns:
+        list: For each number of journeys, a dictionary station id -> earliest arrival
+    """
+    arrivals = {start_id: departure_time}
+    rounds = []
+    for _ in range(max_journeys):
+        improved = dict(arrivals)
+        for departure, arrival, departure_id, arrival_id in zip(day.departure_times, day.arrival_times,
+                                                                 day.departure_stations, day.arrival_stations):
+            if arrivals.get(departure_id, float("inf")) <= departure and arrival < improved.get(arrival_id, float("inf")):
+                improved[arrival_id] = arrival
+        rounds.append(improved)
+        if improved == arrivals:
+            break
+        arrivals = improved
+    return rounds
+
+
+def random_queries(timetable, day, count, seed=0):
+    """
+    Returns count (start id, end id, departure datetime) queries between random stations, during the day.
+    """
+    generator = random.Random(seed)
+    start_of_day = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    queries = []
+    for _ in range(count):
+        start_id, end_id = generator.sample(sorted(timetable.stations), 2)
+        queries.append((start_id, end_id, start_of_day.replace(hour=generator.randrange(5, 20))))
+    return queries
+
+
+class EarliestArrivalTests(SimpleTestCase):
+    """
+    CSA must find the earliest arrival without limit on the number of journeys,
+    RAPTOR the earliest arrival within its rounds. The horizon is limited to the day of the synthetic timetable.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.day = timezone.localdate()
+        cls.timetable = grid_timetable(stations=30, journeys=2000, day=cls.day, seed=0)
+        cls.partition = cls.timetable.day(cls.day)
+        cls.queries = random_queries(cls.timetable, cls.day, 50)
+
+    def reference(self, start_id, depart_date_time):
+        return reference_arrivals(self.partition, start_id, int(depart_date_time.timestamp()), len(self.partition.journey_ids))
+
+    def test_connection_scan_is_optimal(self):
+        for start_id, end_id, depart_date_time in self.queries:
+            with self.subTest(start=start_id, end=end_id, depart=depart_date_time):
+                scan = ConnectionScan(None, None, depart_date_time, timetable=self.timetable, horizon=0)
+                in_connection = scan.scan(start_id, [end_id])
+                arrival = None
+                if end_id in in_connection:
+                    day, index = in_connection[end_id]
+                    arrival = day.arrival_times[index]
+                self.assertEqual(arrival, self.reference(start_id, depart_date_time)[-1].get(end_id))
+
+    def test_raptor_is_optimal_within_its_rounds(self):
+        for start_id, end_id, depart_date_time in self.queries:
+            with self.subTest(start=start_id, end=end_id, depart=depart_date_time):
+                labels = Raptor(None, None, depart_date_time, timetable=self.timetable, horizon=0).rounds(start_id, end_id)
+                arrivals = [parents[end_id][2] for parents in labels if end_id in parents]
+                rounds = self.reference(start_id, depart_date_time)
+                self.assertEqual(arrivals[-1] if arrivals else None, rounds[min(Raptor.max_transfers, len(rounds) - 1)].get(end_id))
+
+
+class ProfileScanTests(SimpleTestCase):
+    """
+    A profile scan must give, for each of its departure times, the same arrivals as a connection scan
+    from that departure time, and itineraries leaving after it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.day = timezone.localdate()
+        cls.timetable = grid_timetable(stations=30, journeys=2000, day=cls.day, seed=0)
+        cls.start_of_day = timezone.make_aware(datetime.combine(cls.day, datetime.min.time()))
+
+    def check_origin(self, start_id, depart_date_times, horizon):
+        end_ids = [station_id for station_id in sorted(self.timetable.stations) if station_id != start_id]
+        profile = ProfileScan(depart_date_times, timetable=self.timetable, horizon=horizon)
+        profile_connections = profile.scan(start_id, end_ids)
+
+        for position, depart_date_time in enumerate(depart_date_times):
+            scan = ConnectionScan(None, None, depart_date_time, timetable=self.timetable, horizon=horizon)
+            in_connection = scan.scan(start_id, end_ids)
+            for end_id in end_ids:
+                with self.subTest(start=start_id, end=end_id, depart=depart_date_time):
+                    expected = None
+                    if end_id in in_connection:
+                        day, index = in_connection[end_id]
+                        expected = day.arrival_times[index]
+                    arrival = None
+                    if end_id in profile_connections and profile_connections[end_id][position] is not None:
+                        day, index = profile_connections[end_id][position]
+                        arrival = day.arrival_times[index]
+                    self.assertEqual(arrival, expected)
+
+                    journey_ids = profile.itinerary(profile_connections, start_id, end_id, position)
+                    self.assertEqual(journey_ids is None, expected is None)
+                    if journey_ids is None:
+                        continue
+                    # Each connection of the itinerary is caught after the arrival of the previous one
+                    station_id, time, legs = end_id, arrival, []
+                    while station_id != start_id:
+                        day, index = profile_connections[station_id][position]
+                        self.assertLessEqual(day.arrival_times[index], time)
+                        legs.append(day.journey_ids[index])
+                        station_id, time = day.departure_stations[index], day.departure_times[index]
+                    self.assertGreaterEqual(time, int(depart_date_time.timestamp()))
+                    self.assertEqual(legs[::-1], journey_ids)
+
+    def test_profile_matches_single_scans(self):
+        generator = random.Random(0)
+        for start_id in generator.sample(sorted(self.timetable.stations), 5):
+            depart_date_times = sorted(self.start_of_day.replace(hour=hour) for hour in generator.sample(range(5, 21), 4))
+            self.check_origin(start_id, depart_date_times, horizon=0)
+
+    def test_single_departure_time(self):
+        start_id = sorted(self.timetable.stations)[0]
+        self.check_origin(start_id, [self.start_of_day.replace(hour=8)], horizon=24)
+
+
+class AStarTests(SimpleTestCase):
+    """
+    Graph.find_optimal_path minimises the distance plus the hours of the trip, keeping a single label per station:
+    a label that costs more but arrives earlier is dropped, so the search may miss the last departures of a station
+    and is not always the earliest arrival. Its paths must be valid and never beat the reference, and the gap
+    is bounded on fixed networks: the itinerary is found for MIN_FOUND of the reachable queries, and arrives
+    first for MIN_EARLIEST of the itineraries found.
+    """
+    MIN_FOUND = 0.9
+    MIN_EARLIEST = 0.4
+
+    def check_network(self, timetable, day, queries):
+        partition = timetable.day(day)
+        reachable = found = earliest = 0
+        for start_id, end_id, depart_date_time in queries:
+            departure_time = int(depart_date_time.timestamp())
+            expected = reference_arrivals(partition, start_id, departure_time, len(partition.journey_ids))[-1].get(end_id)
+            graph = Graph(None, None, depart_date_time, timetable=timetable, horizon=0)
+            path = graph.find_optimal_path(timetable.stations[start_id], timetable.stations[end_id])
+            reachable += expected is not None
+
+            with self.subTest(start=start_id, end=end_id, depart=depart_date_time):
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                if path is None:
+                    continue
+                found += 1
+                self.assertEqual((path[0].id, path[-1].id), (start_id, end_id))
+                # Each leg is caught after the arrival of the previous one, up to the arrival found
+                time = departure_time
+                for departure, arrival in zip(path, path[1:]):
+                    leg = graph.next_departure(lambda day: day.edges.get(departure.id, {}).get(arrival.id), time)
+                    self.assertIsNotNone(leg)
+                    time = leg[0]
+                self.assertEqual(graph.arrival(end_id), time)
+                self.assertGreaterEqual(time, expected)
+                earliest += time == expected
+
+        self.assertGreaterEqual(found, self.MIN_FOUND * reachable)
+        self.assertGreaterEqual(earliest, self.MIN_EARLIEST * found)
+
+    def test_grid_network(self):
+        day = timezone.localdate()
+        timetable = grid_timetable(stations=30, journeys=2000, day=day, seed=0)
+        self.check_network(timetable, day, random_queries(timetable, day, 100))
+
+    def test_dense_network(self):
+        day = timezone.localdate()
+        timetable = dense_timetable(stations=20, neighbours=3, departures=50, day=day, seed=0)
+        self.check_network(timetable, day, random_queries(timetable, day, 100))
@@ -0,0 +1,41 @@
+"""
+Tests of the seat inventory of the journeys
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from reservationsapp.models import Station, Route, Journey, Client, Passager, Reservation, Ticket
+from reservationsapp.seats import SeatUnavailable
+
+from . import LOCAL_CACHES
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ClaimSeatTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username='seat_client')
+        cls.passenger = Passager.objects.create(user=user, first_name='Seat', last_name='Check')
+        cls.reservation = Reservation.objects.create(client=Client.objects.create(user=user, address=''))
+        paris, lyon = Station.objects.bulk_create([Station(city='Paris'), Station(city='Lyon')])
+        route = Route.objects.create(departure_station=paris, arrival_station=lyon)
+        start = timezone.now() + timedelta(days=1)
+        cls.journey = Journey.objects.create(route=route, departure_date_time=start, arrival_date_time=start + timedelta(hours=2))
+
+    def ticket(self, car, seat):
+        return Ticket(reservation=self.reservation, journey=self.journey, passenger=self.passenger, car=car, seat=seat)
+
+    def test_seat_outside_the_train_is_refused(self):
+        for car, seat in ((15, 1), (1, 121), (0, 1)):
+            with self.subTest(car=car, seat=seat), self.assertRaises(SeatUnavailable):
+                self.ticket(car, seat).save()
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_taken_seat_is_refused(self):
+        self.ticket(14, 120).save()
+        with self.assertRaises(SeatUnavailable):
+            self.ticket(14, 120).save()
@@ -0,0 +1,376 @@
+"""
+This file contains the timetable snapshot shared by every search of the process
+
+The snapshot holds the stations and routes of the network, and the journeys of each day,
+loaded lazily the first time a search needs that day.
+Once built, a day is never modified: it is dropped and rebuilt when the signals declared
+in signals.py report a change on a Journey, a Route or a Station.
+
+Versions are stored in the Django cache so that, with a shared cache backend,
+every worker sees the invalidations made by the others (see versions.py). A version also records
+when it was set, which the HTTP cache of the timetable endpoints gives as Last-Modified (see httpcache.py).
+Each snapshot keeps the partitions of at most settings.TIMETABLE_MAX_DAYS days, the oldest built being dropped first.
+"""
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Station, Route, Journey
+from .distances import DistanceMatrix, get_distance_matrix
+from .versions import current_version, new_version, version_time
+
+# Cache keys of the version stamps
+NETWORK_VERSION_KEY = 'timetable:network'
+DAY_VERSION_KEY = 'timetable:day:{}'
+# Renewed with every day, for the views depending on the journeys of all the days
+JOURNEYS_VERSION_KEY = 'timetable:journeys'
+# Renewed when tickets of a day are booked or cancelled, for the views showing the free seats
+SEATS_VERSION_KEY = 'timetable:seats:{}'
+
+
+def epoch(date_time):
+    """
+    Returns a time as epoch seconds.
+
+    Args:
+        date_time (datetime or int): An aware datetime, or epoch seconds that are returned as is
+
+    Returns:
+        int: The epoch seconds
+    """
+    if isinstance(date_time, int):
+        return date_time
+    return int(date_time.timestamp())
+
+
+def local_day(date_time):
+    """
+    Returns the day (in the current time zone) a datetime belongs to.
+
+    Args:
+        date_time (datetime or int): An aware datetime, or epoch seconds
+
+    Returns:
+        date: The local day
+    """
+    if isinstance(date_time, int):
+        date_time = datetime.fromtimestamp(date_time, timezone.utc)
+    return timezone.localtime(date_time).date()
+
+
+def earliest_arrivals(arrival_times):
+    """
+    Returns, for each departure of a list sorted by departure time, the index of the departure
+    arriving first among itself and the following ones.
+    Journeys between the same stations may overtake each other, so the first departure that can
+    be caught is not always the one arriving first.
+
+    Args:
+        arrival_times (array): The arrival times, in the order of the departures
+
+    Returns:
+        array: The index of the earliest arrival from each departure
+    """
+    indexes = array('q', [0]) * len(arrival_times)
+    earliest = len(arrival_times) - 1
+    for index in range(len(arrival_times) - 1, -1, -1):
+        if arrival_times[index] <= arrival_times[earliest]:
+            earliest = index
+        indexes[index] = earliest
+    return indexes
+
+
+def day_bounds(day):
+    """
+    Returns the aware datetimes delimiting a local day, as [start, end[.
+
+    Args:
+        day (date): The day
+
+    Returns:
+        tuple: The start of the day and the start of the next day
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+class Day():
+    """
+    The journeys departing on one day, as read-only arrays keyed by station id
+
+    Attributes:
+        day (date): The day of the partition
+        version (str): The version stamp of the day when it was built
+        edges (dict): departure station id -> arrival station id -> (departure times, arrival times,
+            earliest arrivals, distance), the times being arrays of epoch seconds sorted by departure (see earliest_arrivals)
+        departure_times, arrival_times (array): The connections of the day as epoch seconds, sorted by departure
+        departure_stations, arrival_stations, journey_ids (array): The ids matching each connection
+        trips (dict): route id -> (departure times, arrival times, earliest arrivals, journey ids) arrays,
+            sorted by departure (see earliest_arrivals)
+    """
+
+    def __init__(self, day, version, rows, routes):
+        """
+        Args:
+            day (date): The day of the partition
+            version (str): The version stamp of the day
+            rows (iterable): (journey id, route id, departure, arrival) rows sorted by departure,
+                departure and arrival being aware datetimes or epoch seconds
+            routes (dict): route id -> (departure station id, arrival station id, distance)
+        """
+        self.day = day
+        self.version = version
+
+        edges = {}
+        self.departure_times = array('q')
+        self.arrival_times = array('q')
+        self.departure_stations = array('q')
+        self.arrival_stations = array('q')
+        self.journey_ids = array('q')
+        self.trips = {}
+        for journey_id, route_id, departure, arrival in rows:
+            if route_id not in routes:
+                continue
+            departure_id, arrival_id, distance = routes[route_id]
+            departure = epoch(departure)
+            arrival = epoch(arrival)
+
+            if arrival_id not in edges.setdefault(departure_id, {}):
+                edges[departure_id][arrival_id] = (distance, array('q'), array('q'))
+            edge_departures, edge_arrivals = edges[departure_id][arrival_id][1:]
+            edge_departures.append(departure)
+            edge_arrivals.append(arrival)
+
+            self.departure_times.append(departure)
+            self.arrival_times.append(arrival)
+            self.departure_stations.append(departure_id)
+            self.arrival_stations.append(arrival_id)
+            self.journey_ids.append(journey_id)
+
+            if route_id not in self.trips:
+                self.trips[route_id] = (array('q'), array('q'), array('q'))
+            trip_departures, trip_arrivals, trip_journeys = self.trips[route_id]
+            trip_departures.append(departure)
+            trip_arrivals.append(arrival)
+            trip_journeys.append(journey_id)
+
+        self.trips = {
+            route_id: (trip_departures, trip_arrivals, earliest_arrivals(trip_arrivals), trip_journeys)
+            for route_id, (trip_departures, trip_arrivals, trip_journeys) in self.trips.items()
+        }
+        self.edges = {
+            departure_id: {
+                arrival_id: (edge_departures, edge_arrivals, earliest_arrivals(edge_arrivals), distance)
+                for arrival_id, (distance, edge_departures, edge_arrivals) in arrivals.items()
+            }
+            for departure_id, arrivals in edges.items()
+        }
+
+
+def routes_by_station(routes):
+    """
+    Indexes the routes by departure station.
+
+    Args:
+        routes (dict): route id -> (departure station id, arrival station id, distance)
+
+    Returns:
+        dict: station id -> tuple of the ids of the routes departing from it
+    """
+    routes_from = {}
+    for route_id, (departure_id, arrival_id, distance) in routes.items():
+        routes_from.setdefault(departure_id, []).append(route_id)
+    return {station_id: tuple(route_ids) for station_id, route_ids in routes_from.items()}
+
+
+class Adjacency():
+    """
+    The network as a compressed sparse row (CSR) structure, the stations being numbered from 0
+
+    The arrival stations of the routes departing from the station of index i are
+    targets[offsets[i]:offsets[i + 1]], with the matching distances in weights.
+    Parallel routes between the same stations give a single edge.
+
+    Attributes:
+        station_ids (array): station index -> station id, for the stations served by a route
+        index (dict): station id -> station index
+        offsets (array): Start of the edges of each station in targets, plus the total number of edges
+        targets (array): The index of the arrival station of each edge
+        weights (array): The distance of each edge in km
+    """
+
+    def __init__(self, routes):
+        """
+        Args:
+            routes (dict): route id -> (departure station id, arrival station id, distance)
+        """
+        edges = {}
+        for departure_id, arrival_id, distance in routes.values():
+            edges.setdefault(departure_id, {})[arrival_id] = distance
+            edges.setdefault(arrival_id, {})
+
+        self.station_ids = array('q', sorted(edges))
+        self.index = {station_id: index for index, station_id in enumerate(self.station_ids)}
+        self.offsets = array('q', [0])
+        self.targets = array('q')
+        self.weights = array('d')
+        for station_id in self.station_ids:
+            for arrival_id, distance in edges[station_id].items():
+                self.targets.append(self.index[arrival_id])
+                self.weights.append(distance if distance is not None else float("inf"))
+            self.offsets.append(len(self.targets))
+
+    def __len__(self):
+        return len(self.station_ids)
+
+    def __contains__(self, station_id):
+        return station_id in self.index
+
+
+class Timetable():
+    """
+    A snapshot of the network, shared by all the searches of the process
+
+    Attributes:
+        version (str): The network version stamp when the snapshot was built
+        stations (dict): station id -> Station
+        routes (dict): route id -> (departure station id, arrival station id, distance)
+        routes_from (dict): station id -> tuple of the ids of the routes departing from it
+        adjacency (Adjacency): The routes as a CSR graph
+        distances (DistanceMatrix): The distances between the stations
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.stations = Station.objects.in_bulk()
+        self.distances = get_distance_matrix()
+        # Routes not backfilled yet have no stored distance, it is then read from the matrix
+        self.routes = {
+            route_id: (departure_id, arrival_id, distance if distance is not None else self.distances.distance(departure_id, arrival_id))
+            for route_id, departure_id, arrival_id, distance in Route.objects.values_list('id', 'departure_station_id', 'arrival_station_id', 'distance')
+        }
+        self.routes_from = routes_by_station(self.routes)
+        self.adjacency = Adjacency(self.routes)
+        self._days = OrderedDict()
+        self._lock = threading.Lock()
+
+    def day(self, day):
+        """
+        Returns the partition of a day, building it if it is missing or outdated.
+
+        Args:
+            day (date): The local day
+
+        Returns:
+            Day: The journeys of that day
+        """
+        version = current_version(DAY_VERSION_KEY.format(day.isoformat()))
+        partition = self._days.get(day)
+        if partition is not None and partition.version == version:
+            return partition
+
+        with self._lock:
+            partition = self._days.get(day)
+            if partition is None or partition.version != version:
+                start, end = day_bounds(day)
+                rows = Journey.objects.filter(
+                    departure_date_time__gte=start,
+                    departure_date_time__lt=end
+                ).order_by('departure_date_time').values_list('id', 'route_id', 'departure_date_time', 'arrival_date_time')
+                partition = Day(day, version, rows, self.routes)
+                self._days.pop(day, None)
+                self._days[day] = partition
+                while len(self._days) > getattr(settings, 'TIMETABLE_MAX_DAYS', 62):
+                    self._days.popitem(last=False)
+        return partition
+
+
+class MemoryTimetable(Timetable):
+    """
+    A timetable built from rows kept in memory instead of the database,
+    used to run the routers on synthetic networks (see the bench_* commands)
+    """
+
+    def __init__(self, stations, routes, journeys):
+        """
+        Args:
+            stations (dict): station id -> Station
+            routes (dict): route id -> (departure station id, arrival station id, distance)
+            journeys (iterable): (journey id, route id, departure, arrival) rows, departure and arrival being aware datetimes
+                or epoch seconds
+        """
+        self.version = None
+        self.stations = stations
+        self.distances = DistanceMatrix((station.id, station.latitude, station.longitude) for station in stations.values())
+        self.routes = routes
+        self.routes_from = routes_by_station(routes)
+        self.adjacency = Adjacency(routes)
+        self._rows = {}
+        for row in journeys:
+            self._rows.setdefault(local_day(row[2]), []).append(row)
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def day(self, day):
+        if day not in self._days:
+            # The rows are not needed anymore once the day is built
+            rows = sorted(self._rows.pop(day, ()), key=lambda row: epoch(row[2]))
+            self._days[day] = Day(day, None, rows, self.routes)
+        return self._days[day]
+
+
+_timetable = None
+_timetable_lock = threading.Lock()
+
+
+def get_timetable():
+    """
+    Returns the timetable snapshot of the process, rebuilding it if the network changed.
+
+    Returns:
+        Timetable: The current snapshot
+    """
+    global _timetable
+    version = current_version(NETWORK_VERSION_KEY)
+    timetable = _timetable
+    if timetable is not None and timetable.version == version:
+        return timetable
+
+    with _timetable_lock:
+        if _timetable is None or _timetable.version != version:
+            _timetable = Timetable(version)
+        return _timetable
+
+
+def invalidate_network():
+    """
+    Marks the whole snapshot as outdated, after a change on the stations or the routes.
+    """
+    cache.set(NETWORK_VERSION_KEY, new_version(), None)
+
+
+def invalidate_day(day):
+    """
+    Marks the partition of one day as outdated, after a change on one of its journeys.
+
+    Args:
+        day (date): The local day
+    """
+    version = new_version()
+    cache.set_many({DAY_VERSION_KEY.format(day.isoformat()): version, JOURNEYS_VERSION_KEY: version}, None)
+
+
+def invalidate_seats(day):
+    """
+    Marks the free seats of the journeys of one day as outdated, after tickets were booked or cancelled.
+
+    Args:
+        day (date): The local day
+    """
+    cache.set(SEATS_VERSION_KEY.format(day.isoformat()), new_version(), None)
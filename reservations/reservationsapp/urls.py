@@ -35,11 +35,15 @@ urlpatterns = [
     path('api/get-dates-for-route/<int:route_id>/', views.get_dates_for_route, name='get_dates_for_route'),
     path('api/get-trips-for-date/<int:route_id>/<str:date>/', views.get_trips_for_date, name='get_trips_for_date'),
     path('api/get-journeys-for-route/<int:route_id>/<str:date>/', views.get_journeys_for_route, name='get_journeys_for_route'),
+    path('api/station-catalogue/<str:version>/', views.station_catalogue, name='station_catalogue'),
+    path('api/get-itineraries/', views.get_itineraries, name='get_itineraries'),
+    path('api/get-itineraries-batch/', views.get_itineraries_batch, name='get_itineraries_batch'),
 
     
     # Specific admin urls
     path('api/passengers/<int:passager_id>/', views.get_passager_details, name='get_passager_details'),
     path('api/advanced_search/', views.advanced_search, name='advanced_search'),
     path('advanced_search/', views.advanced_search, name='advanced_search'),
+    path('api/export/<str:kind>/', views.export_data, name='export_data'),
     path('collaborator/', views.collaborator, name='collaborator'),
 ]
@@ -0,0 +1,62 @@
+"""
+This file contains the version stamps shared by the caches of the application
+
+A stamp is a value stored in the Django cache under a key (the network, a day of journeys...), renewed by
+the signals when the data it covers changes. The data built from it is kept as long as the stamp is the same.
+The cache must be shared by every process (see CACHES in settings.py), so that the management commands
+and the other workers see the stamps renewed by one of them.
+
+A stamp that is missing, because it was never set or was evicted from the cache, is set to a new value
+before being read: the data built under the previous value is then rebuilt, never kept.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+
+
+def new_version():
+    """
+    Returns a new version stamp: the time it was set, in epoch seconds, and a random part.
+    """
+    return f"{time.time():.6f}:{uuid.uuid4().hex}"
+
+
+def version_time(version):
+    """
+    Returns the time a version stamp was set in epoch seconds, or None for a missing or older stamp.
+    """
+    try:
+        return float(version.partition(':')[0])
+    except (AttributeError, ValueError):
+        return None
+
+
+def current_versions(keys):
+    """
+    Returns the current stamps of some keys, setting the missing ones.
+
+    Args:
+        keys (list): The cache keys of the stamps
+
+    Returns:
+        dict: key -> stamp
+    """
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        for key in missing:
+            # add keeps the stamp set meanwhile by another process
+            cache.add(key, new_version(), None)
+        stamps.update(cache.get_many(missing))
+        # A cache that cannot keep the stamp gives a new version on every read, the data is rebuilt each time
+        for key in missing:
+            stamps.setdefault(key, new_version())
+    return stamps
+
+
+def current_version(key):
+    """
+    Returns the current stamp of a key, setting it if it is missing.
+    """
+    return current_versions([key])[key]
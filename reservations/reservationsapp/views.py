@@ -2,26 +2,39 @@
 """
 Ce fichier contient toutes les vues et la logique pour faire fonctionner l'application
 """
+import json
 import random
-import pandas
 from datetime import timedelta
 
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Client, Reservation, Passager, Journey, Ticket, Route, Station
+from .models import Client, Reservation, Passager, Journey, Ticket, Route, Station, DailyReservations, DailyRouteTickets
 from .forms import JourneySearchForm, ReservationForm, ClientForm, PassagerForm, SignUpForm, UserUpdateForm
-from django.db.models import Count, Q, Sum
-from django.db.models.functions import TruncDay
-from django.core.paginator import Paginator
+from django.db.models import Count, Q, Sum, Prefetch
+from django.db.models.functions import Coalesce
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.contrib.auth import login
 from django.core import serializers
 from django.core.serializers import serialize
 from django.contrib import messages
-from django.utils.dateparse import parse_date
-from .algorithms2 import Graph
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from django.utils import timezone
+from django.db import transaction
+from .algorithms2 import ENGINES, Raptor
+from .batch import plan_batch
+from .seats import book_tickets, SeatUnavailable
+from .analytics import cached_report
+from .exports import EXPORTS, FORMATS, export_lines
+from .querybudget import query_budget
+from .pagination import KeysetPaginator
+from .timetable import get_timetable, day_bounds, NETWORK_VERSION_KEY, DAY_VERSION_KEY, JOURNEYS_VERSION_KEY, SEATS_VERSION_KEY
+from .httpcache import timetable_response
+from .catalogue import catalogue_version, get_catalogue
 
 
 # User
@@ -72,8 +85,9 @@ def update_profile(request):
 def journeys(request):
     form = JourneySearchForm(request.GET or None)
     best_route = None  # Initialize best_route
-    journeys = Journey.objects.all().order_by('departure_date_time')
+    journeys = Journey.objects.select_related('route__departure_station', 'route__arrival_station')
     best_route = None
+    itineraries = None
     stations = []
     
     if form.is_valid():
@@ -92,33 +106,59 @@ def journeys(request):
             stations = [departure_station, arrival_station]
         if departure_station and arrival_station and depart_date_time:
             stations = [departure_station, arrival_station]
-            graph = Graph(departure_station, arrival_station, depart_date_time)
-            best_route = graph.find_optimal_path(departure_station, arrival_station)
-
-    paginator = Paginator(journeys, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+            engine = form.cleaned_data.get('engine') or 'astar'
+            graph = ENGINES[engine](departure_station, arrival_station, depart_date_time)
+            if engine == 'raptor':
+                # Every itinerary of the Pareto set is shown, the fastest one being the last
+                itineraries = graph.find_pareto_paths(departure_station, arrival_station)
+                best_route = itineraries[-1][1] if itineraries else None
+            else:
+                best_route = graph.find_optimal_path(departure_station, arrival_station)
+
+    # Pages read from the position of the previous one, whatever their depth (see pagination.py)
+    paginator = KeysetPaginator(journeys, 10, keys=('departure_date_time', 'id'))
+    # The journeys are only counted on request (?count=1), the pages do not need it
+    page_obj = paginator.get_page(request.GET.get('after'), request.GET.get('before'), count=request.GET.get('count') == '1')
+    # Links to the other pages, keeping the filters of the search
+    query = request.GET.copy()
+    count_link = query.copy()
+    count_link['count'] = '1'
+    pages = {'count': count_link.urlencode()}
+    query.pop('after', None)
+    query.pop('before', None)
+    query.pop('count', None)
+    for name, parameter, cursor in (('next', 'after', page_obj.next_cursor), ('previous', 'before', page_obj.previous_cursor)):
+        if cursor:
+            link = query.copy()
+            link[parameter] = cursor
+            pages[name] = link.urlencode()
     
     # routes = Route.objects.all()
     # stations = [Station.objects.get(id=id) for route in routes for id in (route.departure_station.id, route.arrival_station.id)]
     serialized_stations = serializers.serialize("json", stations)
 
-    return render(request, 'reservationsapp/list_journeys.html', {'form': form, 'page_obj': page_obj, 'best_route': best_route, 'stations': serialized_stations})
+    return render(request, 'reservationsapp/list_journeys.html', {'form': form, 'page_obj': page_obj, 'pages': pages, 'best_route': best_route, 'itineraries': itineraries, 'stations': serialized_stations})
 
 
 
 # Reservations
 
+@query_budget(4)
 @login_required
 def reservations(request):
     """
     Une vue utilisée pour afficher toutes les réservations effectuées par un client.
     Si le client est un administrateur, toutes les réservations du site lui sont montrées.
+    Les clients et les trajets sont chargés avec les réservations (2 requêtes, quel que soit leur nombre).
     """
-    if request.user.is_staff:
-        reservations = Reservation.objects.select_related('client').prefetch_related('journeys')
-    else:
-        reservations = Reservation.objects.filter(client__user=request.user)
+    journeys = Journey.objects.select_related('route__departure_station', 'route__arrival_station').only(
+        'departure_date_time', 'route__departure_station__city', 'route__arrival_station__city'
+    ).order_by('departure_date_time')
+    reservations = Reservation.objects.select_related('client__user').only(
+        'if_number', 'client__user__first_name', 'client__user__last_name'
+    ).prefetch_related(Prefetch('journeys', queryset=journeys))
+    if not request.user.is_staff:
+        reservations = reservations.filter(client__user=request.user)
     
     context = {
         'reservations' : reservations,
@@ -126,6 +166,7 @@ def reservations(request):
     return render(request, 'reservationsapp/liste_reservations.html', context=context)
 
 
+@query_budget(4)
 @login_required
 def reservation_detail(request, if_number):
     """
@@ -135,12 +176,23 @@ def reservation_detail(request, if_number):
     Args:
         if_number (Char): L'identifiant de la réservation 
     """
+    reservations = Reservation.objects.select_related('client__user').only(
+        'if_number', 'reservation_date', 'client__user__first_name', 'client__user__last_name'
+    )
     if request.user.is_staff:
-        reservation = get_object_or_404(Reservation, if_number=if_number)
+        reservation = get_object_or_404(reservations, if_number=if_number)
     else:
-        reservation = get_object_or_404(Reservation, if_number=if_number, client__user=request.user)
-
-    tickets = Ticket.objects.filter(reservation=reservation).order_by("journey")
+        reservation = get_object_or_404(reservations, if_number=if_number, client__user=request.user)
+
+    # The passenger, journey and stations of every ticket in the same query
+    tickets = Ticket.objects.filter(reservation=reservation).select_related(
+        'passenger', 'journey__route__departure_station', 'journey__route__arrival_station'
+    ).only(
+        'if_number', 'car', 'seat', 'passenger__first_name', 'passenger__last_name',
+        'journey__departure_date_time', 'journey__arrival_date_time',
+        'journey__route__departure_station__city', 'journey__route__departure_station__station_name',
+        'journey__route__arrival_station__city', 'journey__route__arrival_station__station_name'
+    ).order_by("journey")
     context = {
         'reservation' : reservation,
         'tickets' : tickets,
@@ -173,23 +225,35 @@ def edit_reservation(request, if_number=None):
 
     if request.method == 'POST':
         if client_form.is_valid() and reservation_form.is_valid():
-            client_form.save()
-            reservation = reservation_form.save(commit=False)
-            reservation.client = client
-            reservation.save()
-            reservation_form.save_m2m()  # To save many-to-many data for passengers and journeys
-
-            return redirect('reservations:reservation_detail', if_number=reservation.if_number)
+            try:
+                with transaction.atomic():
+                    client_form.save()
+                    reservation = reservation_form.save(commit=False)
+                    reservation.client = client
+                    reservation.save()
+                    reservation_form.save_m2m()  # To save many-to-many data for passengers and journeys
+
+                    # Seats every selected passenger on the journey at once, the passengers already holding
+                    # a ticket for it in this reservation keep their seat
+                    journey = reservation_form.cleaned_data.get('journey')
+                    if journey:
+                        booked = set(reservation.tickets.filter(journey=journey).values_list('passenger_id', flat=True))
+                        passengers = [passenger for passenger in reservation_form.cleaned_data['passengers'] if passenger.pk not in booked]
+                        reservation.journeys.add(journey)
+                        book_tickets(reservation, journey, passengers)
+
+                return redirect('reservations:reservation_detail', if_number=reservation.if_number)
+            except SeatUnavailable as error:
+                # Nothing was saved, a new reservation is still unsaved
+                if not if_number:
+                    reservation.pk = None
+                reservation_form.add_error('journey', str(error))
     
-    routes = Route.objects.all()
-    stations = [Station.objects.get(id=id) for route in routes for id in (route.departure_station.id, route.arrival_station.id)]
-    serialized_stations = serializers.serialize("json", stations)
-
     return render(request, template_name, {
         'client_form': client_form,
         'reservation_form': reservation_form,
-        'routes': routes,
-        'stations': serialized_stations
+        # The map data is fetched by the page from the catalogue of the current network version, cached by the browser
+        'catalogue_url': reverse('reservations:station_catalogue', kwargs={'version': catalogue_version()})
     })
 
 @login_required
@@ -292,12 +356,27 @@ def collaborator(request):
     """
     return render(request, 'admin/statistics_view.html')
 
+def days_between(start_date, end_date):
+    """
+    Yields the days from start_date included to end_date excluded.
+    """
+    day = start_date
+    while day < end_date:
+        yield day
+        day += timedelta(days=1)
+
 @staff_member_required
 @require_http_methods(["GET"])
+@cached_report
 def advanced_search(request):
     """
     A view used to return statistical data (JSON) based on keywords and the type of the request.
     The information are then processed in a template to create a chart.
+    The charts are cached until the data of their period changes (see analytics.py). The reports
+    of reservations, routes and stations read the daily rollups, computed by the refresh_rollups command.
+    Every report covers the days from start_date included to end_date excluded, as reservations_by_day always did:
+    the other reports used to compare the departure times with end_date (<=), its midnight, so that from
+    the end day they only counted the departures at 00:00.
     """
     type_search = request.GET.get('type')
     start_date = request.GET.get('start_date', '')
@@ -309,7 +388,7 @@ def advanced_search(request):
     if end_date:
         end_date = parse_date(end_date)
     # get all days between start_date and end_date
-    days = pandas.date_range(start_date,end_date-timedelta(days=1),freq='d').date.tolist()
+    days = days_between(start_date, end_date)
 
     # Dictionary containing optional keys for the chart, depending on the the chart wanted
     options = {}
@@ -335,18 +414,13 @@ def advanced_search(request):
             'title': {'text': 'Nombre de réservations'}
         }
         
-        dataset = Reservation.objects.annotate(day=TruncDay('reservation_date')).values('day').annotate(count=Count('id')).order_by('day')
-        rows = {} # utilitary dict to find easily a row using the day associated to it
-        for row in dataset:
-            rows[row['day']] = row['count']
+        rows = dict(DailyReservations.objects.filter(
+            day__gte=start_date,
+            day__lt=end_date
+        ).values_list('day', 'reservations')) # utilitary dict to find easily a row using the day associated to it
 
-        data = []
         # If the day is present in rows, there were at least one reservation that day, if not, the number of reservations that day is zero
-        for day in days :
-            if day in rows.keys():
-                data.append({'name': day.strftime('%Y-%m-%d'), 'y': rows[day]})
-            else :
-                data.append({'name': day.strftime('%Y-%m-%d'), 'y': 0})
+        data = [{'name': day.strftime('%Y-%m-%d'), 'y': rows.get(day, 0)} for day in days]
             
         series = [{'name': 'Réservations', 'data': data}]
         
@@ -354,15 +428,15 @@ def advanced_search(request):
 
 
     elif type_search == 'reservations_by_route':
-        queryset = Ticket.objects.filter(
-            journey__departure_date_time__gte=start_date,
-            journey__departure_date_time__lte=end_date
+        queryset = DailyRouteTickets.objects.filter(
+            day__gte=start_date,
+            day__lt=end_date
         ).values(
-            'journey__route__departure_station__city',
-            'journey__route__arrival_station__city'
-        ).annotate(count=Count('id')).order_by('journey__route__departure_station__city')
+            'route__departure_station__city',
+            'route__arrival_station__city'
+        ).annotate(count=Sum('tickets')).order_by('route__departure_station__city')
 
-        data = [{'name': f"{row['journey__route__departure_station__city']} - {row['journey__route__arrival_station__city']}", 'y': row['count']} for row in queryset]
+        data = [{'name': f"{row['route__departure_station__city']} - {row['route__arrival_station__city']}", 'y': row['count']} for row in queryset]
         series = [{'name': 'Nombre de réservations sur cette route', 'data': data}]
 
         chart_type ='pie'
@@ -395,17 +469,19 @@ def advanced_search(request):
         }
         
         maximum = 100 #14 * 120. = Number of cars * number of seats = max space in a train, let at 100 here for demonstration purposes
-        routes = Route.objects.all()
+        # The occupancy is stored on the journeys: one query for the journeys and one for the routes
+        data_by_route = {}
+        journeys = Journey.objects.filter(
+            departure_date_time__gte=day_bounds(start_date)[0],
+            departure_date_time__lt=day_bounds(end_date)[0]
+        ).only('route_id', 'departure_date_time', 'occupancy').order_by('departure_date_time')
+        for journey in journeys :
+            dataset = journey.occupancy * (100. / maximum)
+            data_by_route.setdefault(journey.route_id, []).append({'name': journey.departure_date_time.strftime('%Y-%m-%d %H:%m'), 'y': dataset})
+        routes = Route.objects.select_related('departure_station', 'arrival_station')
         series = []
         for route in routes :
-            data = []
-            journeys = Journey.objects.all().filter(route=route).filter(
-            departure_date_time__gte=start_date,
-            departure_date_time__lte=end_date)
-            for journey in journeys :
-                dataset = Ticket.objects.all().filter(journey=journey).count() * (100. / maximum)
-                data.append({'name': journey.departure_date_time.strftime('%Y-%m-%d %H:%m'), 'y': dataset})
-            series.append({'name': f"{route.departure_station}-{route.arrival_station}", 'data': data, 'visible':False})
+            series.append({'name': f"{route.departure_station}-{route.arrival_station}", 'data': data_by_route.get(route.pk, []), 'visible':False})
         
     elif type_search == 'station_frequency':
         chart_type = 'column'
@@ -417,19 +493,17 @@ def advanced_search(request):
             'title': {'text': 'Voyageurs'}
         }
         
-        stations = Station.objects.all()
+        # Both counts of every station in a single query over its daily traffic
+        period = Q(daily_traffic__day__gte=start_date, daily_traffic__day__lt=end_date)
+        stations = Station.objects.annotate(
+            tickets_departing=Coalesce(Sum('daily_traffic__departures', filter=period), 0),
+            tickets_arriving=Coalesce(Sum('daily_traffic__arrivals', filter=period), 0)
+        )
         series = []
         for station in stations :
-            tickets_arriving = Ticket.objects.all().filter(
-            journey__departure_date_time__gte=start_date,
-            journey__departure_date_time__lte=end_date).filter(journey__route__arrival_station=station).count()
-            
-            tickets_departing =  Ticket.objects.all().filter(
-            journey__departure_date_time__gte=start_date,
-            journey__departure_date_time__lte=end_date).filter(journey__route__departure_station=station).count()
             data = [
-                {'name': "Départs", 'y': tickets_departing},
-                {'name': "Arrivées", 'y': tickets_arriving}
+                {'name': "Départs", 'y': station.tickets_departing},
+                {'name': "Arrivées", 'y': station.tickets_arriving}
             ]
             series.append({'name': f"{station}", 'data': data, 'visible':False})
 
@@ -457,29 +531,175 @@ def advanced_search(request):
     
     return JsonResponse(chart)
 
+@staff_member_required
+@require_http_methods(["GET"])
+def export_data(request, kind):
+    """
+    A view streaming the journeys, reservations or tickets as CSV or NDJSON (see exports.py),
+    filtered by the start_date, end_date and route parameters.
+    """
+    export_format = request.GET.get('format', 'csv')
+    route_id = request.GET.get('route', '')
+
+    if kind not in EXPORTS or export_format not in FORMATS:
+        return JsonResponse({'error': 'Unknown export or format'}, status=404)
+    if not route_id.isdigit() and route_id != '':
+        return JsonResponse({'error': 'Invalid route'}, status=400)
+    # An empty date does not filter, an invalid one must not give the whole export
+    dates = {}
+    for name in ('start_date', 'end_date'):
+        value = request.GET.get(name, '')
+        dates[name] = parse_day(value) if value else None
+        if value and dates[name] is None:
+            return JsonResponse({'error': f'Invalid {name}, expected YYYY-MM-DD'}, status=400)
+
+    content_type, extension = FORMATS[export_format]
+    lines = export_lines(kind, export_format, route_id=int(route_id) if route_id else None, **dates)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{extension}"'
+    return response
+
 #API
 
+@require_http_methods(["GET"])
+def station_catalogue(request, version):
+    """
+    Returns the stations and routes drawn on the reservation map (JSON, see catalogue.py).
+    A version of the catalogue never changes, so that browsers keep it; an outdated version
+    redirects to the current one.
+    """
+    current, content = get_catalogue()
+    if version != current:
+        return redirect('reservations:station_catalogue', version=current)
+    response = HttpResponse(content, content_type='application/json')
+    patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
+
+def parse_day(value):
+    """ Returns the date given in a URL, or None if it is not a valid YYYY-MM-DD date """
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+def day_versions(*keys):
+    """
+    Returns the function giving the version stamps read by a timetable endpoint of one day (see httpcache.py):
+    those of the network and of the given keys for the day.
+    """
+    def versions(route_id, date):
+        day = parse_day(date)
+        return [NETWORK_VERSION_KEY] + ([key.format(day.isoformat()) for key in keys] if day else [])
+    return versions
+
+@timetable_response(lambda route_id: [NETWORK_VERSION_KEY, JOURNEYS_VERSION_KEY])
 def get_dates_for_route(request, route_id):
     """ Returns a list of unique dates when journeys are scheduled for a given route """
     dates = Journey.objects.filter(route_id=route_id).dates('departure_date_time', 'day').distinct()
     dates = [date.strftime('%Y-%m-%d') for date in dates]
     return JsonResponse({'dates': dates})
 
+@timetable_response(day_versions(DAY_VERSION_KEY))
 def get_trips_for_date(request, route_id, date):
     """ Returns journeys for a given route and date """
-    date_obj = datetime.datetime.strptime(date, '%Y-%m-%d').date()
+    date_obj = parse_day(date)
+    if date_obj is None:
+        return JsonResponse({'error': 'Invalid date'}, status=400)
     journeys = Journey.objects.filter(route_id=route_id, departure_date_time__date=date_obj)
     trips = [{'id': journey.id, 'departure_time': journey.departure_date_time.strftime('%H:%M'), 'arrival_time': journey.arrival_date_time.strftime('%H:%M')} for journey in journeys]
     return JsonResponse({'trips': trips})
 
+@timetable_response(day_versions(DAY_VERSION_KEY, SEATS_VERSION_KEY))
 def get_journeys_for_route(request, route_id, date):
     """
     Renvoie les trajets disponibles pour une route et une date données.
     """
-    journeys = Journey.objects.filter(route_id=route_id, departure_date_time__date=date).order_by('departure_date_time')
+    date_obj = parse_day(date)
+    if date_obj is None:
+        return JsonResponse({'error': 'Invalid date'}, status=400)
+    journeys = Journey.objects.filter(route_id=route_id, departure_date_time__date=date_obj).order_by('departure_date_time')
     data = [{
         'id': journey.id,
         'departure_time': journey.departure_date_time.strftime('%Y-%m-%d %H:%M'),
-        'arrival_time': journey.arrival_date_time.strftime('%Y-%m-%d %H:%M')
+        'arrival_time': journey.arrival_date_time.strftime('%Y-%m-%d %H:%M'),
+        'available_seats': journey.available_seats
     } for journey in journeys]
     return JsonResponse(data, safe=False)
+
+def get_itineraries(request):
+    """
+    Returns the itineraries between two stations (JSON), one for each number of transfers,
+    as long as it arrives earlier than the itineraries with fewer transfers.
+    The parameters are those of the journey search form: departure_station, arrival_station and depart_date_time.
+    """
+    form = JourneySearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    departure_station = form.cleaned_data.get('departure_station')
+    arrival_station = form.cleaned_data.get('arrival_station')
+    depart_date_time = form.cleaned_data.get('depart_date_time')
+    if not (departure_station and arrival_station and depart_date_time):
+        return JsonResponse({'error': 'departure_station, arrival_station and depart_date_time are required'}, status=400)
+
+    router = Raptor(departure_station, arrival_station, depart_date_time)
+    itineraries = [{
+        'transfers': transfers,
+        'departure_time': timezone.localtime(legs[0].departure_date_time).strftime('%Y-%m-%d %H:%M'),
+        'arrival_time': timezone.localtime(legs[-1].arrival_date_time).strftime('%Y-%m-%d %H:%M'),
+        'legs': [serialize_leg(journey) for journey in legs]
+    } for transfers, legs in router.find_pareto_paths(departure_station, arrival_station)]
+    return JsonResponse({'itineraries': itineraries})
+
+@login_required
+@require_http_methods(["POST"])
+def get_itineraries_batch(request):
+    """
+    Returns the earliest arrival itinerary of many queries sent at once (JSON).
+    The body is a JSON object {"queries": [{"departure_station": id, "arrival_station": id, "depart_date_time": "YYYY-MM-DD HH:MM"}, ...]}
+    and the itineraries are returned in the same order, null when no itinerary exists.
+    The request must come from a logged in user and carry the CSRF token (X-CSRFToken header).
+    """
+    try:
+        queries = json.loads(request.body)['queries']
+        if len(queries) > getattr(settings, 'BATCH_ROUTING_MAX_QUERIES', 1000):
+            return JsonResponse({'error': 'Too many queries'}, status=400)
+        stations = get_timetable().stations
+        parsed_queries = []
+        for query in queries:
+            depart_date_time = parse_datetime(query['depart_date_time'])
+            if depart_date_time is None:
+                return JsonResponse({'error': f'Invalid departure time in {query}'}, status=400)
+            if timezone.is_naive(depart_date_time):
+                depart_date_time = timezone.make_aware(depart_date_time)
+            departure_station = int(query['departure_station'])
+            arrival_station = int(query['arrival_station'])
+            if departure_station not in stations or arrival_station not in stations:
+                return JsonResponse({'error': f'Unknown station in {query}'}, status=400)
+            parsed_queries.append((departure_station, arrival_station, depart_date_time))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid queries'}, status=400)
+
+    itineraries = plan_batch(parsed_queries)
+
+    # Every journey of the batch is read in one query
+    journeys = Journey.objects.select_related('route__departure_station', 'route__arrival_station').in_bulk(
+        {journey_id for journey_ids in itineraries if journey_ids for journey_id in journey_ids}
+    )
+    results = [{
+        'departure_station': departure_station,
+        'arrival_station': arrival_station,
+        'depart_date_time': timezone.localtime(depart_date_time).strftime('%Y-%m-%d %H:%M'),
+        'legs': [serialize_leg(journeys[journey_id]) for journey_id in journey_ids] if journey_ids else None
+    } for (departure_station, arrival_station, depart_date_time), journey_ids in zip(parsed_queries, itineraries)]
+    return JsonResponse({'itineraries': results})
+
+def serialize_leg(journey):
+    """ Returns the JSON representation of a journey used in an itinerary """
+    return {
+        'id': journey.id,
+        'departure_station': str(journey.route.departure_station),
+        'arrival_station': str(journey.route.arrival_station),
+        'departure_time': timezone.localtime(journey.departure_date_time).strftime('%Y-%m-%d %H:%M'),
+        'arrival_time': timezone.localtime(journey.arrival_date_time).strftime('%Y-%m-%d %H:%M')
+    }
@@ -0,0 +1,38 @@
+// Fills the journey field of the reservation form with the journeys of the chosen route on the chosen date
+function loadJourneys() {
+    const routeId = document.getElementById('id_route').value;
+    const date = document.getElementById('id_date').value;
+    const journeysSelect = document.getElementById('id_journey');
+    const selected = journeysSelect.value;
+
+    journeysSelect.innerHTML = '<option value="">Sélectionner un horaire</option>';
+    if (!routeId || !date) {
+        return;
+    }
+
+    fetch(`/reservations/api/get-journeys-for-route/${routeId}/${date}/`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(data => {
+            data.forEach(journey => {
+                const option = new Option(`${journey.departure_time} - ${journey.arrival_time} (${journey.available_seats} places libres)`, journey.id);
+                option.selected = String(journey.id) === selected;
+                journeysSelect.add(option);
+            });
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            journeysSelect.innerHTML = '<option value="">Erreur dans le chargement des trajets</option>';
+        });
+}
+
+// The options of a form sent back with errors are those of its route and date
+document.addEventListener('DOMContentLoaded', () => {
+    if (document.getElementById('id_journey').options.length <= 1) {
+        loadJourneys();
+    }
+});